@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+#
+# asyncio support for serial ports
+#
+# This file is part of Simple Local Control (SLC). It was added to the copy of
+# pySerial bundled with SLC and is not part of pySerial itself.
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+asyncio transport for serial ports with a file descriptor: serialposix ports
+and socket:// URLs. The port is read and written without blocking from the
+event loop (loop.add_reader/add_writer), so no thread is needed per port.
+
+    transport, protocol = await create_serial_connection(loop, MyProtocol, '/dev/ttyUSB0', baudrate=115200)
+
+    reader, writer = await open_serial_connection(url='/dev/ttyUSB0', baudrate=115200)
+"""
+from __future__ import absolute_import
+
+import asyncio
+import errno
+import os
+
+import serial
+
+# default write buffer limits, as for asyncio's socket transports
+DEFAULT_HIGH_WATER = 64 * 1024
+
+
+class SerialTransport(asyncio.Transport):
+    """\
+    asyncio transport for an open serial port. Received data is passed to
+    protocol.data_received as it arrives. Writes that can not be done at once
+    are buffered, and protocol.pause_writing/resume_writing are called when the
+    buffer crosses the high/low water marks.
+    """
+
+    max_read_size = 65536
+
+    def __init__(self, loop, protocol, serial_instance):
+        super(SerialTransport, self).__init__()
+        try:
+            self._fd = serial_instance.fileno()
+        except (AttributeError, OSError, ValueError):
+            raise ValueError('{} has no file descriptor, it can not be used with asyncio'.format(serial_instance.name))
+        os.set_blocking(self._fd, False)
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial_instance
+        self._buffer = bytearray()
+        self._closing = False
+        self._connection_lost = False
+        self._reading = False
+        self._writing = False
+        self._protocol_paused = False
+        self._high_water = DEFAULT_HIGH_WATER
+        self._low_water = DEFAULT_HIGH_WATER // 4
+        self._extra = {'serial': serial_instance}
+        self._unread = serial_instance._take_unread()    # delivered before data from fd
+        self._loop.call_soon(self._protocol.connection_made, self)
+        self._loop.call_soon(self._start_reading)
+
+    @property
+    def loop(self):
+        """The asyncio event loop used by this transport"""
+        return self._loop
+
+    @property
+    def serial(self):
+        """The underlying serial instance"""
+        return self._serial
+
+    def get_protocol(self):
+        return self._protocol
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def is_closing(self):
+        return self._closing
+
+    # - reading
+
+    def is_reading(self):
+        return self._reading
+
+    def pause_reading(self):
+        """Stop calling protocol.data_received until resume_reading is called"""
+        if self._reading:
+            self._loop.remove_reader(self._fd)
+            self._reading = False
+
+    def resume_reading(self):
+        """Resume calling protocol.data_received"""
+        if not self._reading and not self._closing:
+            self._loop.add_reader(self._fd, self._read_ready)
+            self._reading = True
+
+    def _start_reading(self):
+        if self._closing:
+            return
+        if self._unread:
+            data, self._unread = self._unread, b''
+            self._protocol.data_received(data)
+            if self._closing:
+                return
+        self.resume_reading()
+
+    def _read_ready(self):
+        try:
+            data = os.read(self._fd, self.max_read_size)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self._fatal_error(serial.SerialException('read failed: {}'.format(e)))
+            return
+        if not data:
+            # Disconnected devices, at least on Linux, are always ready to
+            # read but reading returns nothing.
+            self._fatal_error(serial.SerialException(
+                'device reports readiness to read but returned no data '
+                '(device disconnected or multiple access on port?)'))
+            return
+        self._protocol.data_received(data)
+
+    # - writing
+
+    def write(self, data):
+        """\
+        Write data to the port. What can not be written at once is buffered and
+        written as the port becomes ready.
+        """
+        if self._closing or not data:
+            return
+        if not self._buffer:
+            # try to write right away, the usual case
+            try:
+                n = os.write(self._fd, data)
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    self._fatal_error(serial.SerialException('write failed: {}'.format(e)))
+                    return
+                n = 0
+            if n == len(data):
+                return
+            data = memoryview(data)[n:]
+            self._loop.add_writer(self._fd, self._write_ready)
+            self._writing = True
+        self._buffer += data
+        self._maybe_pause_protocol()
+
+    def _write_ready(self):
+        try:
+            n = os.write(self._fd, self._buffer)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self._fatal_error(serial.SerialException('write failed: {}'.format(e)))
+            return
+        del self._buffer[:n]
+        self._maybe_resume_protocol()
+        if not self._buffer:
+            self._loop.remove_writer(self._fd)
+            self._writing = False
+            if self._closing:
+                self._close(None)
+
+    def can_write_eof(self):
+        """Serial ports do not support end of file"""
+        return False
+
+    def write_eof(self):
+        raise NotImplementedError('serial ports do not support write_eof')
+
+    def get_write_buffer_size(self):
+        """Number of bytes waiting to be written to the port"""
+        return len(self._buffer)
+
+    def get_write_buffer_limits(self):
+        return (self._low_water, self._high_water)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """\
+        Set the high/low water marks for write flow control. As for asyncio's
+        transports, low defaults to a quarter of high.
+        """
+        if high is None:
+            high = DEFAULT_HIGH_WATER if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError('high ({!r}) must be >= low ({!r}) must be >= 0'.format(high, low))
+        self._high_water = high
+        self._low_water = low
+        self._maybe_pause_protocol()
+
+    def _maybe_pause_protocol(self):
+        if not self._protocol_paused and len(self._buffer) > self._high_water:
+            self._protocol_paused = True
+            try:
+                self._protocol.pause_writing()
+            except Exception as e:
+                self._loop.call_exception_handler({
+                    'message': 'protocol.pause_writing() failed',
+                    'exception': e,
+                    'transport': self,
+                    'protocol': self._protocol,
+                })
+
+    def _maybe_resume_protocol(self):
+        if self._protocol_paused and len(self._buffer) <= self._low_water:
+            self._protocol_paused = False
+            try:
+                self._protocol.resume_writing()
+            except Exception as e:
+                self._loop.call_exception_handler({
+                    'message': 'protocol.resume_writing() failed',
+                    'exception': e,
+                    'transport': self,
+                    'protocol': self._protocol,
+                })
+
+    # - closing
+
+    def close(self):
+        """\
+        Close the transport once the write buffer is empty, then close the port
+        and call protocol.connection_lost(None).
+        """
+        if self._closing:
+            return
+        self._closing = True
+        self.pause_reading()
+        if not self._buffer:
+            self._loop.call_soon(self._close, None)
+
+    def abort(self):
+        """Close the transport right away, discarding buffered data"""
+        self._abort(None)
+
+    def _fatal_error(self, exc):
+        self._abort(exc)
+
+    def _abort(self, exc):
+        self._closing = True
+        self.pause_reading()
+        del self._buffer[:]
+        if self._writing:
+            self._loop.remove_writer(self._fd)
+            self._writing = False
+        self._loop.call_soon(self._close, exc)
+
+    def _close(self, exc):
+        if self._connection_lost:
+            return
+        self._connection_lost = True
+        if self._writing:
+            self._loop.remove_writer(self._fd)
+            self._writing = False
+        try:
+            self._serial.close()
+        finally:
+            self._protocol.connection_lost(exc)
+
+
+async def create_serial_connection(loop, protocol_factory, *args, **kwargs):
+    """\
+    Open a serial port (arguments as for serial.serial_for_url) and connect it
+    to a new protocol instance, returns (transport, protocol).
+    """
+    serial_instance = serial.serial_for_url(*args, **kwargs)
+    protocol = protocol_factory()
+    try:
+        transport = SerialTransport(loop, protocol, serial_instance)
+    except ValueError:
+        serial_instance.close()
+        raise
+    return (transport, protocol)
+
+
+async def open_serial_connection(limit=None, **kwargs):
+    """\
+    Open a serial port (keyword arguments as for serial.serial_for_url) and
+    return an asyncio (StreamReader, StreamWriter) pair for it. The writer's
+    drain() waits while the write buffer is above its high water mark.
+    """
+    serial_instance = serial.serial_for_url(**kwargs)
+    try:
+        return await open_serial_streams(serial_instance, limit)
+    except ValueError:
+        serial_instance.close()
+        raise
+
+
+async def open_serial_streams(serial_instance, limit=None):
+    """\
+    Return an asyncio (StreamReader, StreamWriter) pair for an already open
+    serial port, e.g. one opened in an executor because opening it blocks
+    (socket://, rfc2217://). ValueError is raised, and the port is left open,
+    if it has no file descriptor.
+    """
+    loop = asyncio.get_running_loop()
+    if limit is None:
+        limit = 2 ** 16     # asyncio.streams._DEFAULT_LIMIT
+    reader = asyncio.StreamReader(limit=limit, loop=loop)
+    protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+    transport = SerialTransport(loop, protocol, serial_instance)
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    return (reader, writer)
@@ -69,11 +69,6 @@ try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
-try:
-    import Queue
-except ImportError:
-    import queue as Queue
-
 import serial
 from serial.serialutil import SerialBase, SerialException, to_bytes, \
     iterbytes, PortNotOpenError, Timeout
@@ -378,6 +373,9 @@ class TelnetSubnegotiation(object):
 class Serial(SerialBase):
     """Serial port implementation for RFC 2217 remote serial ports."""
 
+    # read(), in_waiting and reset_input_buffer() honor self._unread
+    _supports_unread = True
+
     BAUDRATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
                  9600, 19200, 38400, 57600, 115200)
 
@@ -397,6 +395,8 @@ class Serial(SerialBase):
         self._rfc2217_port_settings = None
         self._rfc2217_options = None
         self._read_buffer = None
+        self._read_condition = None
+        self._read_eof = False
         super(Serial, self).__init__(*args, **kwargs)  # must be last call in case of auto-open
 
     def open(self):
@@ -419,9 +419,11 @@ class Serial(SerialBase):
             self._socket = None
             raise SerialException("Could not open port {}: {}".format(self.portstr, msg))
 
-        # use a thread save queue as buffer. it also simplifies implementing
-        # the read timeout
-        self._read_buffer = Queue.Queue()
+        # received data is appended to a byte buffer by the reader thread, a
+        # condition variable wakes up readers waiting for data
+        self._read_buffer = bytearray()
+        self._read_condition = threading.Condition()
+        self._read_eof = False
         # to ensure that user writes does not interfere with internal
         # telnet/rfc2217 options establish a lock
         self._write_lock = threading.Lock()
@@ -599,7 +601,7 @@ class Serial(SerialBase):
         """Return the number of bytes currently in the input buffer."""
         if not self.is_open:
             raise PortNotOpenError()
-        return self._read_buffer.qsize()
+        return len(self._unread) + len(self._read_buffer)
 
     def read(self, size=1):
         """\
@@ -609,21 +611,23 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise PortNotOpenError()
-        data = bytearray()
-        try:
-            timeout = Timeout(self._timeout)
-            while len(data) < size:
+        if self._unread:
+            return self._read_after_unread(size)
+        timeout = Timeout(self._timeout)
+        with self._read_condition:
+            while len(self._read_buffer) < size:
+                if self._read_eof:
+                    # connection lost: return what is left, the next read fails
+                    self._read_eof = False
+                    break
                 if self._thread is None or not self._thread.is_alive():
                     raise SerialException('connection failed (reader thread died)')
-                buf = self._read_buffer.get(True, timeout.time_left())
-                if buf is None:
-                    return bytes(data)
-                data += buf
                 if timeout.expired():
                     break
-        except Queue.Empty:  # -> timeout
-            pass
-        return bytes(data)
+                self._read_condition.wait(timeout.time_left())
+            data = bytes(self._read_buffer[:size])
+            del self._read_buffer[:size]
+        return data
 
     def write(self, data):
         """\
@@ -646,8 +650,9 @@ class Serial(SerialBase):
             raise PortNotOpenError()
         self.rfc2217_send_purge(PURGE_RECEIVE_BUFFER)
         # empty read buffer
-        while self._read_buffer.qsize():
-            self._read_buffer.get(False)
+        del self._unread[:]
+        with self._read_condition:
+            del self._read_buffer[:]
 
     def reset_output_buffer(self):
         """\
@@ -728,13 +733,17 @@ class Serial(SerialBase):
     # - - - RFC2217 specific - - -
 
     def _telnet_read_loop(self):
-        """Read loop for the socket."""
+        """\
+        Read loop for the socket. Runs of plain data between IAC bytes are
+        found with bytes.find and stored as a whole, only IAC sequences go
+        through the byte by byte state machine.
+        """
         mode = M_NORMAL
         suboption = None
         try:
             while self.is_open:
                 try:
-                    data = self._socket.recv(1024)
+                    data = self._socket.recv(65536)
                 except socket.timeout:
                     # just need to get out of recv form time to time to check if
                     # still alive
@@ -743,31 +752,40 @@ class Serial(SerialBase):
                     # connection fails -> terminate loop
                     if self.logger:
                         self.logger.debug("socket error in reader thread: {}".format(e))
-                    self._read_buffer.put(None)
                     break
                 if not data:
-                    self._read_buffer.put(None)
                     break  # lost connection
-                for byte in iterbytes(data):
+                if mode == M_NORMAL and suboption is None and IAC not in data:
+                    # fast path: plain data only
+                    self._read_buffer_extend(data)
+                    continue
+                received = bytearray()
+                position = 0
+                while position < len(data):
                     if mode == M_NORMAL:
-                        # interpret as command or as data
-                        if byte == IAC:
-                            mode = M_IAC_SEEN
+                        # store data up to the next IAC in read buffer or sub
+                        # option buffer depending on state
+                        iac = data.find(IAC, position)
+                        end = len(data) if iac < 0 else iac
+                        if suboption is not None:
+                            suboption += data[position:end]
                         else:
-                            # store data in read buffer or sub option buffer
-                            # depending on state
-                            if suboption is not None:
-                                suboption += byte
-                            else:
-                                self._read_buffer.put(byte)
-                    elif mode == M_IAC_SEEN:
+                            received += data[position:end]
+                        if iac < 0:
+                            break
+                        mode = M_IAC_SEEN
+                        position = iac + 1
+                        continue
+                    byte = data[position:position + 1]
+                    position += 1
+                    if mode == M_IAC_SEEN:
                         if byte == IAC:
                             # interpret as command doubled -> insert character
                             # itself
                             if suboption is not None:
                                 suboption += IAC
                             else:
-                                self._read_buffer.put(IAC)
+                                received += IAC
                             mode = M_NORMAL
                         elif byte == SB:
                             # sub option start
@@ -789,10 +807,22 @@ class Serial(SerialBase):
                     elif mode == M_NEGOTIATE:  # DO, DONT, WILL, WONT was received, option now following
                         self._telnet_negotiate_option(telnet_command, byte)
                         mode = M_NORMAL
+                if received:
+                    self._read_buffer_extend(received)
         finally:
+            # wake up readers, they return what is left in the buffer
+            with self._read_condition:
+                self._read_eof = True
+                self._read_condition.notify_all()
             if self.logger:
                 self.logger.debug("read thread terminated")
 
+    def _read_buffer_extend(self, data):
+        """Append received data to the read buffer and wake up readers"""
+        with self._read_condition:
+            self._read_buffer += data
+            self._read_condition.notify_all()
+
     # - incoming telnet commands and options
 
     def _telnet_process_command(self, command):
@@ -1044,6 +1074,16 @@ class PortManager(object):
 
     # - outgoing data escaping
 
+    def escape_data(self, data):
+        """\
+        Return the data, escaped so that no IAC character in the data stream
+        messes up the Telnet state machine in the client. All outgoing data
+        has to be escaped this way.
+
+        socket.sendall(escape_data(serial.read(serial.in_waiting or 1)))
+        """
+        return to_bytes(data).replace(IAC, IAC_DOUBLED)
+
     def escape(self, data):
         """\
         This generator function is for the user. All outgoing data has to be
@@ -1051,51 +1091,60 @@ class PortManager(object):
         the Telnet state machine in the server.
 
         socket.sendall(escape(data))
+
+        Yields one byte at a time, escape_data() is much faster.
         """
-        for byte in iterbytes(data):
-            if byte == IAC:
-                yield IAC
-                yield IAC
-            else:
-                yield byte
+        for byte in iterbytes(self.escape_data(data)):
+            yield byte
 
     # - incoming data filter
 
-    def filter(self, data):
+    def filter_data(self, data):
         """\
-        Handle a bunch of incoming bytes. This is a generator. It will yield
-        all characters not of interest for Telnet/RFC 2217.
+        Handle a bunch of incoming bytes and return all bytes not of interest
+        for Telnet/RFC 2217. Telnet commands and subnegotiations found are
+        processed before it returns. Runs of plain data between IAC bytes are
+        found with bytes.find and copied as a whole, only IAC sequences go
+        through the byte by byte state machine.
 
         The idea is that the reader thread pushes data from the socket through
         this filter:
 
-        for byte in filter(socket.recv(1024)):
-            # do things like CR/LF conversion/whatever
-            # and write data to the serial port
-            serial.write(byte)
+        serial.write(filter_data(socket.recv(65536)))
 
         (socket error handling code left as exercise for the reader)
         """
-        for byte in iterbytes(data):
+        data = to_bytes(data)
+        if self.mode == M_NORMAL and self.suboption is None and IAC not in data:
+            # fast path: plain data only
+            return data
+        received = bytearray()
+        position = 0
+        while position < len(data):
             if self.mode == M_NORMAL:
-                # interpret as command or as data
-                if byte == IAC:
-                    self.mode = M_IAC_SEEN
+                # pass data up to the next IAC to our consumer or store it in
+                # sub option buffer depending on state
+                iac = data.find(IAC, position)
+                end = len(data) if iac < 0 else iac
+                if self.suboption is not None:
+                    self.suboption += data[position:end]
                 else:
-                    # store data in sub option buffer or pass it to our
-                    # consumer depending on state
-                    if self.suboption is not None:
-                        self.suboption += byte
-                    else:
-                        yield byte
-            elif self.mode == M_IAC_SEEN:
+                    received += data[position:end]
+                if iac < 0:
+                    break
+                self.mode = M_IAC_SEEN
+                position = iac + 1
+                continue
+            byte = data[position:position + 1]
+            position += 1
+            if self.mode == M_IAC_SEEN:
                 if byte == IAC:
                     # interpret as command doubled -> insert character
                     # itself
                     if self.suboption is not None:
                         self.suboption += byte
                     else:
-                        yield byte
+                        received += byte
                     self.mode = M_NORMAL
                 elif byte == SB:
                     # sub option start
@@ -1117,6 +1166,28 @@ class PortManager(object):
             elif self.mode == M_NEGOTIATE:  # DO, DONT, WILL, WONT was received, option now following
                 self._telnet_negotiate_option(self.telnet_command, byte)
                 self.mode = M_NORMAL
+        return bytes(received)
+
+    def filter(self, data):
+        """\
+        Handle a bunch of incoming bytes. This is a generator. It will yield
+        all characters not of interest for Telnet/RFC 2217.
+
+        The idea is that the reader thread pushes data from the socket through
+        this filter:
+
+        for byte in filter(socket.recv(1024)):
+            # do things like CR/LF conversion/whatever
+            # and write data to the serial port
+            serial.write(byte)
+
+        (socket error handling code left as exercise for the reader)
+
+        All of data is processed when the first byte is requested, one byte
+        is yielded at a time. filter_data() is much faster.
+        """
+        for byte in iterbytes(self.filter_data(data)):
+            yield byte
 
     # - incoming telnet commands and options
 
@@ -301,6 +301,18 @@ TIOCSBRK = getattr(termios, 'TIOCSBRK', 0x5427)
 TIOCCBRK = getattr(termios, 'TIOCCBRK', 0x5428)
 
 
+if hasattr(os, 'readv'):
+    def _read_into(fd, view):
+        """Read from fd into the memoryview, returns the number of bytes read"""
+        return os.readv(fd, [view])
+else:
+    def _read_into(fd, view):
+        """Read from fd into the memoryview, returns the number of bytes read"""
+        data = os.read(fd, len(view))
+        view[:len(data)] = data
+        return len(data)
+
+
 class Serial(SerialBase, PlatformSpecific):
     """\
     Serial port class POSIX implementation. Serial port configuration is
@@ -308,6 +320,9 @@ class Serial(SerialBase, PlatformSpecific):
     systems.
     """
 
+    # read(), in_waiting and reset_input_buffer() honor self._unread
+    _supports_unread = True
+
     def open(self):
         """\
         Open port with current settings. This may throw a SerialException
@@ -547,7 +562,7 @@ class Serial(SerialBase, PlatformSpecific):
         """Return the number of bytes currently in the input buffer."""
         #~ s = fcntl.ioctl(self.fd, termios.FIONREAD, TIOCM_zero_str)
         s = fcntl.ioctl(self.fd, TIOCINQ, TIOCM_zero_str)
-        return struct.unpack('I', s)[0]
+        return len(self._unread) + struct.unpack('I', s)[0]
 
     # select based implementation, proved to work on many systems
     def read(self, size=1):
@@ -558,48 +573,109 @@ class Serial(SerialBase, PlatformSpecific):
         """
         if not self.is_open:
             raise PortNotOpenError()
+        if self._unread:
+            return self._read_after_unread(size)
         read = bytearray()
         timeout = Timeout(self._timeout)
         while len(read) < size:
+            buf = self._read_nonblocking(os.read, size - len(read), timeout)
+            if buf is None:
+                break   # timeout or cancel_read
+            if not read and len(buf) == size:
+                return buf
+            read.extend(buf)
+            if timeout.expired():
+                break
+        return bytes(read)
+
+    def readinto(self, b):
+        """\
+        Read bytes from the serial port directly into the writable buffer b
+        (zero-copy) and return the number of bytes read. Timeouts work as
+        for read(): with no timeout it will block until b is full.
+        """
+        if not self.is_open:
+            raise PortNotOpenError()
+        view = memoryview(b)
+        if view.itemsize != 1:
+            view = view.cast('B')
+        # bytes left over by read_until() come first
+        count = min(len(view), len(self._unread))
+        view[:count] = self._unread[:count]
+        del self._unread[:count]
+        timeout = Timeout(self._timeout)
+        while count < len(view):
+            n = self._read_nonblocking(_read_into, view[count:], timeout)
+            if n is None:
+                break   # timeout or cancel_read
+            count += n
+            if timeout.expired():
+                break
+        return count
+
+    def _read_nonblocking(self, read_function, argument, timeout):
+        """\
+        Call read_function(fd, argument) (os.read or _read_into) on the non
+        blocking port. Only when nothing can be read yet, wait with select
+        until data arrives. Returns the result or None if the timeout
+        expired or the read was cancelled.
+        """
+        # check for cancel_read() on every call, not only when waiting, so it
+        # works while data keeps arriving and its byte is not left for a
+        # later read
+        try:
+            if os.read(self.pipe_abort_read_r, 1000):
+                return None
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                raise SerialException('read failed: {}'.format(e))
+        ready = False
+        while True:
             try:
-                ready, _, _ = select.select([self.fd, self.pipe_abort_read_r], [], [], timeout.time_left())
-                if self.pipe_abort_read_r in ready:
-                    os.read(self.pipe_abort_read_r, 1000)
-                    break
-                # If select was used with a timeout, and the timeout occurs, it
-                # returns with empty lists -> thus abort read operation.
-                # For timeout == 0 (non-blocking operation) also abort when
-                # there is nothing to read.
-                if not ready:
-                    break   # timeout
-                buf = os.read(self.fd, size - len(read))
+                result = read_function(self.fd, argument)
             except OSError as e:
-                # this is for Python 3.x where select.error is a subclass of
-                # OSError ignore BlockingIOErrors and EINTR. other errors are shown
+                # ignore BlockingIOErrors and EINTR. other errors are shown
                 # https://www.python.org/dev/peps/pep-0475.
                 if e.errno not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
                     raise SerialException('read failed: {}'.format(e))
-            except select.error as e:
-                # this is for Python 2.x
-                # ignore BlockingIOErrors and EINTR. all errors are shown
-                # see also http://www.python.org/dev/peps/pep-3151/#select
-                if e[0] not in (errno.EAGAIN, errno.EALREADY, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EINTR):
-                    raise SerialException('read failed: {}'.format(e))
             else:
-                # read should always return some data as select reported it was
-                # ready to read when we get to this point.
-                if not buf:
+                if result:
+                    return result
+                if ready:
                     # Disconnected devices, at least on Linux, show the
                     # behavior that they are always ready to read immediately
                     # but reading returns nothing.
                     raise SerialException(
                         'device reports readiness to read but returned no data '
                         '(device disconnected or multiple access on port?)')
-                read.extend(buf)
-
+            # For timeout == 0 (non-blocking operation) abort when there is
+            # nothing to read.
             if timeout.expired():
-                break
-        return bytes(read)
+                return None
+            try:
+                ready, _, _ = select.select([self.fd, self.pipe_abort_read_r], [], [], timeout.time_left())
+            except OSError as e:
+                # this is for Python 3.x where select.error is a subclass of
+                # OSError ignore EINTR. other errors are shown
+                if e.errno != errno.EINTR:
+                    raise SerialException('read failed: {}'.format(e))
+                ready = []
+                continue
+            except select.error as e:
+                # this is for Python 2.x
+                # ignore EINTR. all errors are shown
+                # see also http://www.python.org/dev/peps/pep-3151/#select
+                if e[0] != errno.EINTR:
+                    raise SerialException('read failed: {}'.format(e))
+                ready = []
+                continue
+            if self.pipe_abort_read_r in ready:
+                os.read(self.pipe_abort_read_r, 1000)
+                return None
+            # If select was used with a timeout, and the timeout occurs, it
+            # returns with empty lists -> thus abort read operation.
+            if not ready:
+                return None
 
     def cancel_read(self):
         if self.is_open:
@@ -680,6 +756,7 @@ class Serial(SerialBase, PlatformSpecific):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise PortNotOpenError()
+        del self._unread[:]
         self._reset_input_buffer()
 
     def reset_output_buffer(self):
@@ -803,6 +880,9 @@ class PosixPollSerial(Serial):
     disconnecting while it's in use (e.g. USB-serial unplugged).
     """
 
+    # read through read() below
+    readinto = SerialBase.readinto
+
     def read(self, size=1):
         """\
         Read size bytes from the serial port. If a timeout is set it may
@@ -811,6 +891,8 @@ class PosixPollSerial(Serial):
         """
         if not self.is_open:
             raise PortNotOpenError()
+        if self._unread:
+            return self._read_after_unread(size)
         read = bytearray()
         timeout = Timeout(self._timeout)
         poll = select.poll()
@@ -850,6 +932,9 @@ class VTIMESerial(Serial):
     just ignore that.
     """
 
+    # read through read() below, the port is blocking
+    readinto = SerialBase.readinto
+
     def _reconfigure_port(self, force_update=True):
         """Set communication parameters on opened port."""
         super(VTIMESerial, self)._reconfigure_port()
@@ -888,6 +973,8 @@ class VTIMESerial(Serial):
         """
         if not self.is_open:
             raise PortNotOpenError()
+        if self._unread:
+            return self._read_after_unread(size)
         read = bytearray()
         while len(read) < size:
             buf = os.read(self.fd, size - len(read))
@@ -177,6 +177,11 @@ class SerialBase(io.RawIOBase):
     PARITIES = (PARITY_NONE, PARITY_EVEN, PARITY_ODD, PARITY_MARK, PARITY_SPACE)
     STOPBITS = (STOPBITS_ONE, STOPBITS_ONE_POINT_FIVE, STOPBITS_TWO)
 
+    # set in subclasses whose read(), in_waiting and reset_input_buffer()
+    # honor the bytes read_until() keeps in self._unread, so that it can read
+    # in blocks
+    _supports_unread = False
+
     def __init__(self,
                  port=None,
                  baudrate=9600,
@@ -200,6 +205,8 @@ class SerialBase(io.RawIOBase):
         self.is_open = False
         self.portstr = None
         self.name = None
+        # bytes read_until() read past the terminator, read() returns them first
+        self._unread = bytearray()
         # correct values are assigned below through properties
         self._port = None
         self._baudrate = None
@@ -655,7 +662,44 @@ class SerialBase(io.RawIOBase):
         """\
         Read until an expected sequence is found ('\n' by default), the size
         is exceeded or until timeout occurs.
+
+        Ports that support it read what in_waiting reports (at least one
+        byte) at a time. The terminator is searched from where the previous
+        search stopped and bytes read past it are kept for the next read.
         """
+        if not self._supports_unread:
+            return self._read_until_bytewise(expected, size)
+        lenterm = len(expected)
+        line = self._unread
+        self._unread = bytearray()
+        timeout = Timeout(self._timeout)
+        scanned = 0
+        while True:
+            end = line.find(expected, scanned)
+            if end >= 0:
+                end += lenterm
+                if size is None or end <= size:
+                    break
+            if size is not None and len(line) >= size:
+                end = size
+                break
+            scanned = max(0, len(line) - lenterm + 1)
+            if line and timeout.expired():
+                end = len(line)
+                break
+            wanted = self.in_waiting or 1
+            if size is not None:
+                wanted = min(wanted, size - len(line))
+            data = self.read(wanted)
+            if not data:
+                end = len(line)
+                break
+            line += data
+        self._unread = line[end:]
+        return bytes(line[:end])
+
+    def _read_until_bytewise(self, expected=LF, size=None):
+        """read_until() for ports that read one byte at a time"""
         lenterm = len(expected)
         line = bytearray()
         timeout = Timeout(self._timeout)
@@ -673,6 +717,27 @@ class SerialBase(io.RawIOBase):
                 break
         return bytes(line)
 
+    def _read_after_unread(self, size):
+        """\
+        read() for subclasses when read_until() left bytes over: those come
+        first, the rest is read from the port.
+        """
+        data = bytes(self._unread[:size])
+        del self._unread[:size]
+        if len(data) < size:
+            data += self.read(size - len(data))
+        return data
+
+    def _take_unread(self):
+        """\
+        Return and clear the bytes read_until() read from the port but did not
+        return. Code that reads the file descriptor directly (ReaderHub,
+        serial.aio, the RFC 2217 gateway) delivers these first.
+        """
+        data = bytes(self._unread)
+        del self._unread[:]
+        return data
+
     def iread_until(self, *args, **kwargs):
         """\
         Read lines, implemented as generator. It will raise StopIteration on
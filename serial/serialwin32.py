@@ -23,6 +23,9 @@ from serial.serialutil import SerialBase, SerialException, to_bytes, PortNotOpen
 class Serial(SerialBase):
     """Serial port implementation for Win32 based on ctypes."""
 
+    # read(), in_waiting and reset_input_buffer() honor self._unread
+    _supports_unread = True
+
     BAUDRATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
                  9600, 19200, 38400, 57600, 115200)
 
@@ -257,7 +260,7 @@ class Serial(SerialBase):
         comstat = win32.COMSTAT()
         if not win32.ClearCommError(self._port_handle, ctypes.byref(flags), ctypes.byref(comstat)):
             raise SerialException("ClearCommError failed ({!r})".format(ctypes.WinError()))
-        return comstat.cbInQue
+        return len(self._unread) + comstat.cbInQue
 
     def read(self, size=1):
         """\
@@ -267,6 +270,8 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise PortNotOpenError()
+        if self._unread:
+            return self._read_after_unread(size)
         if size > 0:
             win32.ResetEvent(self._overlapped_read.hEvent)
             flags = win32.DWORD()
@@ -352,6 +357,7 @@ class Serial(SerialBase):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise PortNotOpenError()
+        del self._unread[:]
         win32.PurgeComm(self._port_handle, win32.PURGE_RXCLEAR | win32.PURGE_RXABORT)
 
     def reset_output_buffer(self):
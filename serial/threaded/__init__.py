@@ -11,8 +11,12 @@ Support threading with serial ports.
 """
 from __future__ import absolute_import
 
+import errno
+import os
+import select
 import serial
 import threading
+import traceback
 
 
 class Protocol(object):
@@ -60,10 +64,37 @@ class Packetizer(Protocol):
         super(Packetizer, self).connection_lost(exc)
 
     def data_received(self, data):
-        """Buffer received data, find TERMINATOR, call handle_packet"""
-        self.buffer.extend(data)
-        while self.TERMINATOR in self.buffer:
-            packet, self.buffer = self.buffer.split(self.TERMINATOR, 1)
+        """\
+        Buffer received data, find TERMINATOR, call handle_packets with all
+        packets completed by data.
+
+        The buffer is scanned once, starting just before the new data, and
+        the consumed packets are removed from it once per call, so the work
+        stays linear in the amount of data however many packets it holds.
+        """
+        buffer = self.buffer
+        terminator = self.TERMINATOR
+        # a terminator can only end in the new data
+        position = max(0, len(buffer) - len(terminator) + 1)
+        buffer.extend(data)
+        packets = []
+        start = 0
+        while True:
+            end = buffer.find(terminator, position)
+            if end < 0:
+                break
+            packets.append(buffer[start:end])
+            start = position = end + len(terminator)
+        if packets:
+            del buffer[:start]
+            self.handle_packets(packets)
+
+    def handle_packets(self, packets):
+        """\
+        Process the list of packets found in one call of data_received. Calls
+        handle_packet for each, override to process them all at once.
+        """
+        for packet in packets:
             self.handle_packet(packet)
 
     def handle_packet(self, packet):
@@ -257,6 +288,261 @@ class ReaderThread(threading.Thread):
         self.close()
 
 
+class HubConnection(object):
+    """\
+    Transport of one serial port served by a ReaderHub, handed to its
+    Protocol. Like the ReaderThread it offers thread safe write() and
+    close(), stop() only stops reading the port.
+    """
+
+    def __init__(self, hub, serial_instance, fd, protocol):
+        self.hub = hub
+        self.serial = serial_instance
+        self.fd = fd
+        self.protocol = protocol
+        self.alive = True
+        self._unread = serial_instance._take_unread()    # delivered before data from fd
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """Stop reading the port, connection_lost is called from the hub thread"""
+        self.hub.remove(self)
+
+    def write(self, data):
+        """Thread safe writing (uses lock)"""
+        with self._lock:
+            return self.serial.write(data)
+
+    def close(self):
+        """Stop reading and close the serial port (uses lock)"""
+        # use the lock to let other threads finish writing
+        with self._lock:
+            self.stop()
+            self.serial.close()
+
+
+class ReaderHub(threading.Thread):
+    """\
+    Serve many serial ports from one thread: their file descriptors are
+    registered with one epoll (poll where epoll is not available) and
+    data_received of each port's Protocol is called from this thread, so the
+    thread count does not grow with the number of ports. Several hubs can
+    share the ports out when one thread is not enough.
+
+    Ports must have a file descriptor (serialposix). A port's abort pipe is
+    registered too, so serial.cancel_read() stops reading the port as it
+    does for a ReaderThread.
+
+        hub = ReaderHub()
+        hub.start()
+        transport, protocol = hub.add(serial_instance, protocol_factory)
+        ...
+        hub.close()
+    """
+
+    def __init__(self):
+        super(ReaderHub, self).__init__()
+        self.daemon = True
+        self.alive = True
+        self._poller = select.epoll() if hasattr(select, 'epoll') else select.poll()
+        self._connections = {}      # fd (port or its abort pipe) -> HubConnection
+        self._stopping = set()      # connections to remove, set from other threads
+        self._starting = set()      # connections with bytes left over by read_until()
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            _set_nonblocking(fd)
+        self._poller.register(self._wakeup_r, select.POLLIN)
+
+    def add(self, serial_instance, protocol_factory):
+        """\
+        Start serving an open serial port, returns (transport, protocol).
+        connection_made is called from the calling thread, all other
+        Protocol calls come from the hub thread.
+        """
+        try:
+            fd = serial_instance.fileno()
+        except (AttributeError, OSError, ValueError):
+            raise ValueError('{} has no file descriptor, use a ReaderThread'.format(serial_instance.name))
+        protocol = protocol_factory()
+        connection = HubConnection(self, serial_instance, fd, protocol)
+        protocol.connection_made(connection)
+        abort_fd = getattr(serial_instance, 'pipe_abort_read_r', None)
+        with self._lock:
+            self._connections[fd] = connection
+            self._poller.register(fd, select.POLLIN | select.POLLERR | select.POLLHUP)
+            if abort_fd is not None:
+                self._connections[abort_fd] = connection
+                self._poller.register(abort_fd, select.POLLIN)
+            if connection._unread:
+                self._starting.add(connection)
+        self._wakeup()
+        return (connection, protocol)
+
+    def remove(self, connection):
+        """Stop serving a port, connection_lost is called from the hub thread"""
+        if not connection.alive or not self.alive:
+            return  # already removed, or the hub has stopped and removes it
+        if threading.current_thread() is self:
+            self._remove(connection, None)
+            return
+        with self._lock:
+            self._stopping.add(connection)
+        self._wakeup()
+        if self.is_alive():
+            connection._stopped.wait(2)
+
+    def stop(self):
+        """Stop the hub thread, connection_lost is called for all ports"""
+        self.alive = False
+        self._wakeup()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(2)
+
+    def close(self):
+        """Stop the hub thread and close all ports"""
+        with self._lock:
+            connections = set(self._connections.values())
+        self.stop()
+        for connection in connections:
+            connection.serial.close()
+
+    def run(self):
+        """Dispatch loop"""
+        while self.alive:
+            try:
+                events = self._poller.poll()
+            except (IOError, OSError) as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            for fd, event in events:
+                if fd == self._wakeup_r:
+                    self._drain(fd)
+                    with self._lock:
+                        starting, self._starting = self._starting, set()
+                        stopping, self._stopping = self._stopping, set()
+                    for connection in starting:
+                        if connection.alive:
+                            self._deliver_unread(connection)
+                    for connection in stopping:
+                        self._remove(connection, None)
+                    continue
+                connection = self._connections.get(fd)
+                if connection is None:
+                    continue    # removed while handling earlier events
+                if fd != connection.fd:
+                    # cancel_read() on the port
+                    self._drain(fd)
+                    self._remove(connection, None)
+                elif event & select.POLLIN:
+                    self._read(connection, fd)
+                else:
+                    self._remove(connection, serial.SerialException('device reports error (poll)'))
+        with self._lock:
+            connections = set(self._connections.values())
+        for connection in connections:
+            self._remove(connection, None)
+        with self._lock:
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+            self._wakeup_r = self._wakeup_w = None
+        if hasattr(self._poller, 'close'):
+            self._poller.close()
+
+    def _read(self, connection, fd):
+        """Read what the port has and pass it to the protocol"""
+        if connection._unread and not self._deliver_unread(connection):
+            return
+        try:
+            data = os.read(fd, 65536)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self._remove(connection, serial.SerialException('read failed: {}'.format(e)))
+            return
+        if not data:
+            # Disconnected devices, at least on Linux, are always ready to
+            # read but reading returns nothing.
+            self._remove(connection, serial.SerialException(
+                'device reports readiness to read but returned no data '
+                '(device disconnected or multiple access on port?)'))
+            return
+        # make a separated try-except for called user code
+        try:
+            connection.protocol.data_received(data)
+        except Exception as e:
+            self._remove(connection, e)
+
+    def _deliver_unread(self, connection):
+        """\
+        Pass the bytes read_until() left over to the protocol before anything
+        read from the port, returns False if the port was removed.
+        """
+        data, connection._unread = connection._unread, b''
+        if data:
+            try:
+                connection.protocol.data_received(data)
+            except Exception as e:
+                self._remove(connection, e)
+                return False
+        return True
+
+    def _remove(self, connection, error):
+        """Unregister a port and call connection_lost (hub thread only)"""
+        with self._lock:
+            fds = [fd for fd, c in self._connections.items() if c is connection]
+            for fd in fds:
+                del self._connections[fd]
+                try:
+                    self._poller.unregister(fd)
+                except (KeyError, ValueError, OSError):
+                    pass    # already closed
+        if not fds:
+            return
+        connection.alive = False
+        try:
+            connection.protocol.connection_lost(error)
+        except Exception:
+            # keep serving the other ports
+            traceback.print_exc()
+        connection._stopped.set()
+
+    def _wakeup(self):
+        with self._lock:
+            if self._wakeup_w is None:
+                return  # hub thread has ended
+            try:
+                os.write(self._wakeup_w, b'x')
+            except OSError:
+                pass    # pipe full, a wake up is pending anyway
+
+    @staticmethod
+    def _drain(fd):
+        try:
+            while os.read(fd, 1024):
+                pass
+        except OSError:
+            pass
+
+    # - -  context manager
+
+    def __enter__(self):
+        """Enter context handler: start the hub"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Leave context: close all ports"""
+        self.close()
+
+
+def _set_nonblocking(fd):
+    import fcntl
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 # test
 if __name__ == '__main__':
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+#
+# Serve many serial ports over RFC 2217 from one asyncio event loop
+#
+# This file is part of Simple Local Control (SLC). It was added to the copy of
+# pySerial bundled with SLC and is not part of pySerial itself.
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+RFC 2217 gateway: each serial port is exposed on its own TCP port and all of
+them are served by one asyncio event loop, using rfc2217.PortManager for the
+protocol state.
+
+Ports with a file descriptor (POSIX serial ports, ptys) are read and written
+without blocking from the event loop. Other ports (e.g. loop://) are polled
+for received data and written from a worker thread. Data is only read from a
+serial port while the client can take it, and the client is only read while
+the serial port keeps up (backpressure in both directions). Modem lines are
+polled with a timer.
+
+    python -m serial.tools.rfc2217_gateway 7000=/dev/ttyUSB0 7001=/dev/ttyUSB1
+"""
+from __future__ import absolute_import
+
+import asyncio
+import logging
+import os
+import socket
+
+import serial
+import serial.rfc2217
+
+# pending bytes for the serial port at which the client is paused and resumed
+HIGH_WATER = 65536
+LOW_WATER = 16384
+# interval for reading ports that have no file descriptor
+READ_POLL_INTERVAL = 0.01
+
+
+class NoModemLines(object):
+    """\
+    Stands in for a serial port without modem lines (e.g. a pty) towards
+    PortManager: control line changes are ignored and all inputs read as
+    inactive. Everything else is passed on to the port.
+    """
+
+    cts = dsr = ri = cd = False
+
+    def __init__(self, serial_instance):
+        object.__setattr__(self, 'port', serial_instance)
+
+    def __getattr__(self, name):
+        return getattr(self.port, name)
+
+    def __setattr__(self, name, value):
+        if name not in ('dtr', 'rts', 'break_condition'):
+            setattr(self.port, name, value)
+
+
+class SerialChannel(object):
+    """\
+    One serial port exposed on one TCP port. At most one client is connected
+    at a time, others are turned away.
+    """
+
+    def __init__(self, loop, serial_instance, tcp_port, modem_poll_interval=1.0):
+        self.loop = loop
+        self.serial = serial_instance
+        self.tcp_port = tcp_port
+        self.modem_poll_interval = modem_poll_interval
+        self.logger = logging.getLogger('rfc2217.gateway.{}'.format(tcp_port))
+        self.client = None
+        self._pending = bytearray()     # data for the serial port not yet written
+        self._reading = False
+        self._writing = False
+        self._client_paused = False
+        self._client_full = False       # client transport buffer above its limit
+        self._read_timer = None
+        self._modem_timer = None
+        try:
+            self.fd = self.serial.fileno()
+        except (AttributeError, OSError, ValueError):
+            self.fd = None
+        if self.fd is not None:
+            os.set_blocking(self.fd, False)
+        else:
+            self.serial.timeout = 0
+        # the port as PortManager sees it
+        self.managed = self.serial
+        try:
+            self.serial.cts
+        except (OSError, serial.SerialException):
+            self.logger.info('{} has no modem lines'.format(self.serial.name))
+            self.managed = NoModemLines(self.serial)
+
+    # - client
+
+    def attach(self, client):
+        """Connect a client, returns False if the port is in use"""
+        if self.client is not None:
+            return False
+        self.client = client
+        self._client_full = False
+        self._client_paused = False
+        del self._pending[:]
+        self.managed.rts = True
+        self.managed.dtr = True
+        self._modem_timer = self.loop.call_later(self.modem_poll_interval, self._poll_modem_lines)
+        if self.fd is not None:
+            # bytes read_until() left over come before data read from the fd
+            data = self.serial._take_unread()
+            if data:
+                client.send(data)
+        self.update_reading()
+        return True
+
+    def detach(self, client):
+        """Disconnect the client, reset control lines as no terminal is connected now"""
+        if self.client is not client:
+            return
+        self.client = None
+        self.update_reading()
+        if self._modem_timer is not None:
+            self._modem_timer.cancel()
+            self._modem_timer = None
+        if self.fd is not None and self._writing:
+            self.loop.remove_writer(self.fd)
+            self._writing = False
+        del self._pending[:]
+        try:
+            self.managed.dtr = False
+            self.managed.rts = False
+        except serial.SerialException as e:
+            self.logger.warning('could not reset control lines: {}'.format(e))
+
+    def set_client_full(self, full):
+        """Flow control from the client transport (pause_writing/resume_writing)"""
+        self._client_full = full
+        self.update_reading()
+
+    def _poll_modem_lines(self):
+        if self.client is None:
+            return
+        try:
+            self.client.manager.check_modem_lines()
+        except serial.SerialException as e:
+            self.logger.warning('could not read modem lines: {}'.format(e))
+        self._modem_timer = self.loop.call_later(self.modem_poll_interval, self._poll_modem_lines)
+
+    # - serial port -> client
+
+    def update_reading(self):
+        """Read the serial port only while a client is connected and can take the data"""
+        want = (self.client is not None and not self._client_full and
+                not getattr(self.client.manager, '_remote_suspend_flow', False))
+        if want == self._reading:
+            return
+        self._reading = want
+        if self.fd is not None:
+            if want:
+                self.loop.add_reader(self.fd, self._serial_readable)
+            else:
+                self.loop.remove_reader(self.fd)
+        elif want:
+            self._read_timer = self.loop.call_soon(self._poll_serial)
+        elif self._read_timer is not None:
+            self._read_timer.cancel()
+            self._read_timer = None
+
+    def _serial_readable(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.logger.error('serial read failed: {}'.format(e))
+            self.client.close()
+            return
+        if not data:
+            # Disconnected devices, at least on Linux, are always ready to
+            # read but reading returns nothing: stop reading the fd, or the
+            # loop would spin on it
+            self.logger.error('serial port reports readiness to read but returned no data '
+                              '(device disconnected?)')
+            self.loop.remove_reader(self.fd)
+            self._reading = False
+            self.client.close()
+            return
+        self.client.send(data)
+
+    def _poll_serial(self):
+        try:
+            waiting = self.serial.in_waiting
+            data = self.serial.read(waiting) if waiting else b''
+        except serial.SerialException as e:
+            self.logger.error('serial read failed: {}'.format(e))
+            self.client.close()
+            return
+        if data:
+            self.client.send(data)
+        if self._reading:
+            self._read_timer = self.loop.call_later(0 if data else READ_POLL_INTERVAL, self._poll_serial)
+
+    # - client -> serial port
+
+    def write(self, data):
+        """Queue data for the serial port, pausing the client when too much is pending"""
+        if not data:
+            return
+        self._pending += data
+        if self.fd is not None:
+            self._serial_writable()
+        elif not self._writing:
+            self._start_thread_write()
+        self._check_pending()
+
+    def _serial_writable(self):
+        try:
+            written = os.write(self.fd, self._pending)
+        except BlockingIOError:
+            written = 0
+        except OSError as e:
+            self.logger.error('serial write failed: {}'.format(e))
+            self.client.close()
+            return
+        del self._pending[:written]
+        if self._pending and not self._writing:
+            self.loop.add_writer(self.fd, self._serial_writable)
+            self._writing = True
+        elif not self._pending and self._writing:
+            self.loop.remove_writer(self.fd)
+            self._writing = False
+        self._check_pending()
+
+    def _start_thread_write(self):
+        data = bytes(self._pending)
+        del self._pending[:]
+        self._writing = True
+        future = self.loop.run_in_executor(None, self.serial.write, data)
+        future.add_done_callback(self._thread_write_done)
+
+    def _thread_write_done(self, future):
+        self._writing = False
+        if future.exception() is not None:
+            self.logger.error('serial write failed: {}'.format(future.exception()))
+            if self.client is not None:
+                self.client.close()
+            return
+        if self._pending and self.client is not None:
+            self._start_thread_write()
+        self._check_pending()
+
+    def _check_pending(self):
+        if self.client is None:
+            return
+        if not self._client_paused and len(self._pending) > HIGH_WATER:
+            self._client_paused = True
+            self.client.transport.pause_reading()
+        elif self._client_paused and len(self._pending) <= LOW_WATER:
+            self._client_paused = False
+            self.client.transport.resume_reading()
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.serial.close()
+
+
+class GatewayProtocol(asyncio.Protocol):
+    """\
+    Network side of a SerialChannel. It also is the connection PortManager
+    writes Telnet/RFC 2217 answers to.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.transport = None
+        self.manager = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        peer = transport.get_extra_info('peername')
+        if self.channel.client is not None:
+            self.channel.logger.warning('refusing {}: port is in use'.format(peer))
+            transport.close()
+            return
+        self.channel.logger.info('connected: {}'.format(peer))
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        logger = self.channel.logger if self.channel.logger.isEnabledFor(logging.DEBUG) else None
+        self.manager = serial.rfc2217.PortManager(self.channel.managed, self, logger)
+        self.channel.attach(self)
+
+    def connection_lost(self, exc):
+        if self.manager is not None:
+            self.channel.logger.info('disconnected')
+            self.channel.detach(self)
+
+    def data_received(self, data):
+        self.channel.write(self.manager.filter_data(data))
+        # the client may have suspended or resumed the flow
+        self.channel.update_reading()
+
+    def pause_writing(self):
+        self.channel.set_client_full(True)
+
+    def resume_writing(self):
+        self.channel.set_client_full(False)
+
+    def send(self, data):
+        """Send data from the serial port to the client"""
+        self.transport.write(self.manager.escape_data(data))
+
+    def write(self, data):
+        """Connection interface for PortManager"""
+        self.transport.write(data)
+
+    def close(self):
+        self.transport.close()
+
+
+async def serve(ports, host='', baudrate=9600, modem_poll_interval=1.0):
+    """\
+    Serve the given {tcp_port: serial_url} until cancelled. All serial ports
+    are opened first, so a missing port is reported before anything is served.
+    """
+    loop = asyncio.get_running_loop()
+    channels = []
+    servers = []
+    try:
+        for tcp_port, url in sorted(ports.items()):
+            serial_instance = serial.serial_for_url(url, baudrate=baudrate)
+            channels.append(SerialChannel(loop, serial_instance, tcp_port, modem_poll_interval))
+        for channel in channels:
+            server = await loop.create_server(
+                lambda channel=channel: GatewayProtocol(channel), host or None, channel.tcp_port)
+            servers.append(server)
+            logging.info('serving {} on TCP port {}'.format(channel.serial.name, channel.tcp_port))
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        for server in servers:
+            server.close()
+        for channel in channels:
+            channel.close()
+
+
+def main():
+    """Command line tool, entry point"""
+
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='RFC 2217 gateway - serve many serial ports over the network from one process.',
+        epilog='Example: %(prog)s 7000=/dev/ttyUSB0 7001=/dev/ttyUSB1 7002=loop://')
+
+    parser.add_argument(
+        'ports',
+        nargs='+',
+        metavar='TCPPORT=SERIALPORT',
+        help='TCP port and serial port name or URL to serve on it')
+
+    parser.add_argument(
+        '--host',
+        help='local address to listen on, default: all',
+        default='')
+
+    parser.add_argument(
+        '--baudrate',
+        type=int,
+        help='initial baud rate, default: %(default)s',
+        default=9600)
+
+    parser.add_argument(
+        '--modem-poll',
+        type=float,
+        metavar='SECONDS',
+        help='modem line polling interval, default: %(default)s',
+        default=1.0)
+
+    parser.add_argument(
+        '-v', '--verbose',
+        dest='verbosity',
+        action='count',
+        help='print more diagnostic messages (option can be given multiple times)',
+        default=0)
+
+    args = parser.parse_args()
+
+    if args.verbosity > 3:
+        args.verbosity = 3
+    level = (logging.WARNING,
+             logging.INFO,
+             logging.DEBUG,
+             logging.NOTSET)[args.verbosity]
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger().setLevel(level)
+
+    ports = {}
+    for spec in args.ports:
+        tcp_port, _, url = spec.partition('=')
+        if not tcp_port.isdigit() or not url:
+            parser.error('expected TCPPORT=SERIALPORT, got {!r}'.format(spec))
+        if int(tcp_port) in ports:
+            parser.error('TCP port {} given twice'.format(tcp_port))
+        ports[int(tcp_port)] = url
+
+    try:
+        asyncio.run(serve(ports, args.host, args.baudrate, args.modem_poll))
+    except serial.SerialException as e:
+        sys.stderr.write('could not open port: {}\n'.format(e))
+        sys.exit(1)
+    except OSError as e:
+        sys.stderr.write('could not listen: {}\n'.format(e))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
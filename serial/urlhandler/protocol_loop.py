@@ -15,19 +15,17 @@
 # - "debug" print diagnostic messages
 from __future__ import absolute_import
 
+import collections
 import logging
 import numbers
+import threading
 import time
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
-try:
-    import queue
-except ImportError:
-    import Queue as queue
 
-from serial.serialutil import SerialBase, SerialException, to_bytes, iterbytes, SerialTimeoutException, PortNotOpenError
+from serial.serialutil import SerialBase, SerialException, to_bytes, SerialTimeoutException, PortNotOpenError, Timeout
 
 # map log level names to constants. used in from_url()
 LOGGER_LEVELS = {
@@ -39,15 +37,29 @@ LOGGER_LEVELS = {
 
 
 class Serial(SerialBase):
-    """Serial port implementation that simulates a loop back connection in plain software."""
+    """\
+    Serial port implementation that simulates a loop back connection in plain
+    software.
+
+    Written data is kept as a queue of byte chunks (a chunked ring buffer)
+    holding at most buffer_size bytes, guarded by a condition variable that
+    wakes readers when data arrives and writers when space is freed.
+    """
+
+    # read(), in_waiting and reset_input_buffer() honor self._unread
+    _supports_unread = True
 
     BAUDRATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
                  9600, 19200, 38400, 57600, 115200)
 
     def __init__(self, *args, **kwargs):
         self.buffer_size = 4096
-        self.queue = None
         self.logger = None
+        self._chunks = collections.deque()
+        self._offset = 0        # bytes already read from self._chunks[0]
+        self._count = 0         # bytes in the buffer
+        self._condition = threading.Condition()
+        self._cancel_read = False
         self._cancel_write = False
         super(Serial, self).__init__(*args, **kwargs)
 
@@ -59,7 +71,7 @@ class Serial(SerialBase):
         if self.is_open:
             raise SerialException("Port is already open.")
         self.logger = None
-        self.queue = queue.Queue(self.buffer_size)
+        self._cancel_read = False
 
         if self._port is None:
             raise SerialException("Port must be configured before it can be used.")
@@ -80,11 +92,9 @@ class Serial(SerialBase):
 
     def close(self):
         if self.is_open:
-            self.is_open = False
-            try:
-                self.queue.put_nowait(None)
-            except queue.Full:
-                pass
+            with self._condition:
+                self.is_open = False
+                self._condition.notify_all()
         super(Serial, self).close()
 
     def _reconfigure_port(self):
@@ -131,8 +141,8 @@ class Serial(SerialBase):
         if self.logger:
             # attention the logged value can differ from return value in
             # threaded environments...
-            self.logger.debug('in_waiting -> {:d}'.format(self.queue.qsize()))
-        return self.queue.qsize()
+            self.logger.debug('in_waiting -> {:d}'.format(len(self._unread) + self._count))
+        return len(self._unread) + self._count
 
     def read(self, size=1):
         """\
@@ -142,36 +152,57 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise PortNotOpenError()
-        if self._timeout is not None and self._timeout != 0:
-            timeout = time.time() + self._timeout
-        else:
-            timeout = None
+        if self._unread:
+            return self._read_after_unread(size)
+        timeout = Timeout(self._timeout)  # XXX inter char timeout
         data = bytearray()
-        while size > 0 and self.is_open:
-            try:
-                b = self.queue.get(timeout=self._timeout)  # XXX inter char timeout
-            except queue.Empty:
-                if self._timeout == 0:
+        with self._condition:
+            while len(data) < size and self.is_open:
+                if self._count:
+                    self._take(data, size - len(data))
+                    self._condition.notify_all()
+                    continue
+                if self._cancel_read:
+                    self._cancel_read = False
                     break
-            else:
-                if b is not None:
-                    data += b
-                    size -= 1
-                else:
+                if timeout.expired():
+                    if self.logger and not timeout.is_non_blocking:
+                        self.logger.info('read timeout')
                     break
-            # check for timeout now, after data has been read.
-            # useful for timeout = 0 (non blocking) read
-            if timeout and time.time() > timeout:
-                if self.logger:
-                    self.logger.info('read timeout')
-                break
+                self._condition.wait(timeout.time_left())
         return bytes(data)
 
+    def _take(self, data, size):
+        """Move up to size bytes from the buffer to the bytearray data"""
+        while size and self._chunks:
+            chunk = self._chunks[0]
+            end = min(len(chunk), self._offset + size)
+            data += memoryview(chunk)[self._offset:end]
+            size -= end - self._offset
+            self._count -= end - self._offset
+            if end == len(chunk):
+                self._chunks.popleft()
+                self._offset = 0
+            else:
+                self._offset = end
+
+    def _clear(self):
+        """Discard all buffered data and wake writers waiting for space"""
+        with self._condition:
+            self._chunks.clear()
+            self._offset = 0
+            self._count = 0
+            self._condition.notify_all()
+
     def cancel_read(self):
-        self.queue.put_nowait(None)
+        with self._condition:
+            self._cancel_read = True
+            self._condition.notify_all()
 
     def cancel_write(self):
-        self._cancel_write = True
+        with self._condition:
+            self._cancel_write = True
+            self._condition.notify_all()
 
     def write(self, data):
         """\
@@ -196,9 +227,27 @@ class Serial(SerialBase):
             if self._cancel_write:
                 return 0  # XXX
             raise SerialTimeoutException('Write timeout')
-        for byte in iterbytes(data):
-            self.queue.put(byte, timeout=self._write_timeout)
-        return len(data)
+        timeout = Timeout(self._write_timeout)
+        written = 0
+        with self._condition:
+            while written < len(data):
+                if not self.is_open:
+                    raise PortNotOpenError()
+                free = self.buffer_size - self._count
+                if free > 0:
+                    # store the data as is when it fits, else as much as fits
+                    chunk = data[written:written + free] if written or len(data) > free else data
+                    self._chunks.append(chunk)
+                    self._count += len(chunk)
+                    written += len(chunk)
+                    self._condition.notify_all()
+                    continue
+                if self._cancel_write:
+                    return written
+                if timeout.expired():
+                    raise SerialTimeoutException('Write timeout')
+                self._condition.wait(timeout.time_left())
+        return written
 
     def reset_input_buffer(self):
         """Clear input buffer, discarding all that is in the buffer."""
@@ -206,11 +255,8 @@ class Serial(SerialBase):
             raise PortNotOpenError()
         if self.logger:
             self.logger.info('reset_input_buffer()')
-        try:
-            while self.queue.qsize():
-                self.queue.get_nowait()
-        except queue.Empty:
-            pass
+        del self._unread[:]
+        self._clear()
 
     def reset_output_buffer(self):
         """\
@@ -221,11 +267,7 @@ class Serial(SerialBase):
             raise PortNotOpenError()
         if self.logger:
             self.logger.info('reset_output_buffer()')
-        try:
-            while self.queue.qsize():
-                self.queue.get_nowait()
-        except queue.Empty:
-            pass
+        self._clear()
 
     @property
     def out_waiting(self):
@@ -235,8 +277,8 @@ class Serial(SerialBase):
         if self.logger:
             # attention the logged value can differ from return value in
             # threaded environments...
-            self.logger.debug('out_waiting -> {:d}'.format(self.queue.qsize()))
-        return self.queue.qsize()
+            self.logger.debug('out_waiting -> {:d}'.format(self._count))
+        return self._count
 
     def _update_break_state(self):
         """\
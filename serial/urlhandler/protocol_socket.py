@@ -22,7 +22,13 @@ import errno
 import logging
 import select
 import socket
+import struct
 import time
+try:
+    import fcntl
+    import termios
+except ImportError:
+    fcntl = None
 try:
     import urlparse
 except ImportError:
@@ -45,6 +51,9 @@ POLL_TIMEOUT = 5
 class Serial(SerialBase):
     """Serial port implementation for plain sockets."""
 
+    # read(), in_waiting and reset_input_buffer() honor self._unread
+    _supports_unread = True
+
     BAUDRATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
                  9600, 19200, 38400, 57600, 115200)
 
@@ -140,7 +149,11 @@ class Serial(SerialBase):
         # Poll the socket to see if it is ready for reading.
         # If ready, at least one byte will be to read.
         lr, lw, lx = select.select([self._socket], [], [], 0)
-        return len(lr)
+        if lr and fcntl is not None:
+            # the exact number where the platform can tell
+            s = fcntl.ioctl(self._socket.fileno(), termios.FIONREAD, b'\0\0\0\0')
+            return len(self._unread) + max(1, struct.unpack('I', s)[0])
+        return len(self._unread) + len(lr)
 
     # select based implementation, similar to posix, but only using socket API
     # to be portable, additionally handle socket timeout which is used to
@@ -153,6 +166,8 @@ class Serial(SerialBase):
         """
         if not self.is_open:
             raise PortNotOpenError()
+        if self._unread:
+            return self._read_after_unread(size)
         read = bytearray()
         timeout = Timeout(self._timeout)
         while len(read) < size:
@@ -243,6 +258,7 @@ class Serial(SerialBase):
         """Clear input buffer, discarding all that is in the buffer."""
         if not self.is_open:
             raise PortNotOpenError()
+        del self._unread[:]
 
         # just use recv to remove input, while there is some
         ready = True
@@ -2,57 +2,308 @@ import socket
 import struct
 import serial
 import time
+import selectors
+import argparse
+import sys
+import random
+import configparser
+from collections import deque
+from array import array
 
-# Function to handle network communication
-def handle_network_communication():
-    # Create a TCP socket
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+# Simulated register file: 32K x 16-bit registers per unit
+REGISTER_COUNT = 0x8000
+DEFAULT_VALUE = 0x0001  # Initial value of every register
+INITIAL_VALUES = {0x602B: 0x000F}  # Registers with a different initial value
+PACKET_SIZE = 4  # Common packet structure 4 bytes
+RECV_SIZE = 65536
 
-    # Bind the socket to an address and port
-    host = '127.0.0.1'  # Localhost
-    port = 65432        # Arbitrary non-privileged port
-    server_socket.bind((host, port))
+# Scenario settings and their defaults (a unit that answers instantly and never fails)
+SCENARIO_DEFAULTS = {
+    'seed': '0',
+    'latency': '0',  # Mean response latency in seconds
+    'jitter': '0',  # Spread of the latency in seconds
+    'distribution': 'uniform',  # fixed, uniform, normal or exponential
+    'bandwidth': '0',  # Response bytes per second per connection (0 = unlimited)
+    'drop_rate': '0',  # Probability a response is never sent
+    'short_rate': '0',  # Probability a response is cut short
+    'corrupt_rate': '0',  # Probability a response has a corrupted data word
+    'reset_rate': '0',  # Probability per response that the connection is reset
+}
 
-    # Start listening for incoming connections
-    server_socket.listen(1)
-    print(f"Server listening on {host}:{port}")
+# Class holding the register file of one simulated unit
+class RegisterFile:
+    def __init__(self, index=0):
+        self.index = index  # Unit number, used to pick its scenario section
+        self.registers = array('H', [DEFAULT_VALUE]) * REGISTER_COUNT
+        for address, value in INITIAL_VALUES.items():
+            self.registers[address] = value
+
+    # Function to apply one packet; returns the response, or None for a write
+    def handle_packet(self, address_bits, data_bits, verbose=False):
+        rw_bit = (address_bits >> 15) & 0x1  # Extract rw_bit from the most significant bit of address_bits
+        address = address_bits & 0x7FFF  # Mask out the rw_bit
+
+        if verbose:
+            print(f"Received packet: RW={rw_bit}, Address={address:04X}, Data={data_bits:04X}")
+
+        if rw_bit == 1:  # Read command: echo the address word followed by the register value
+            return struct.pack('<HH', address_bits, self.registers[address])
+        self.registers[address] = data_bits  # No response for write command
+        return None
+
+    # Function to apply a buffer of complete packets; returns all the read
+    # responses as one buffer
+    def handle_packets(self, data, verbose=False):
+        registers = self.registers
+        words = array('H')
+        append = words.append
+        for address_bits, data_bits in struct.iter_unpack('<HH', data):  # Little-endian format
+            if verbose:
+                print(f"Received packet: RW={address_bits >> 15}, Address={address_bits & 0x7FFF:04X}, Data={data_bits:04X}")
+            if address_bits & 0x8000:  # Read command
+                append(address_bits)
+                append(registers[address_bits & 0x7FFF])
+            else:  # Write command, no response
+                registers[address_bits] = data_bits
+        if sys.byteorder != 'little':
+            words.byteswap()
+        return words.tobytes()
+
+# Class holding the simulated link behaviour of one connection. Each
+# connection gets its own random generator, seeded from the scenario seed,
+# the unit number and the connection number, so runs are reproducible.
+class Scenario:
+    def __init__(self, settings, seed):
+        self.latency = float(settings['latency'])
+        self.jitter = float(settings['jitter'])
+        self.distribution = settings['distribution'].lower()
+        self.bandwidth = float(settings['bandwidth'])
+        self.drop_rate = float(settings['drop_rate'])
+        self.short_rate = float(settings['short_rate'])
+        self.corrupt_rate = float(settings['corrupt_rate'])
+        self.reset_rate = float(settings['reset_rate'])
+        if self.distribution not in ('fixed', 'uniform', 'normal', 'exponential'):
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        self.random = random.Random(seed)
+        self.tokens = self.bandwidth
+        self.last_refill = time.monotonic()
+
+    # Function to draw one response latency in seconds
+    def draw_latency(self):
+        if self.distribution == 'fixed' or not (self.latency or self.jitter):
+            latency = self.latency
+        elif self.distribution == 'uniform':
+            latency = self.random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+        elif self.distribution == 'normal':
+            latency = self.random.gauss(self.latency, self.jitter)
+        else:
+            latency = self.random.expovariate(1 / self.latency) if self.latency else 0
+        return max(0.0, latency)
+
+    # Function to apply faults to one response; returns the bytes to send
+    # (None to drop it) and whether the connection should be reset
+    def apply_faults(self, response):
+        draw = self.random.random
+        if self.reset_rate and draw() < self.reset_rate:
+            return None, True
+        if self.drop_rate and draw() < self.drop_rate:
+            return None, False
+        if self.corrupt_rate and draw() < self.corrupt_rate:
+            response = response[:2] + bytes(byte ^ self.random.randrange(1, 256) for byte in response[2:])
+        if self.short_rate and draw() < self.short_rate:
+            response = response[:self.random.randrange(1, PACKET_SIZE)]
+        return response, False
+
+    # Function to get how many bytes may be sent now under the bandwidth cap
+    def allowance(self, now):
+        if not self.bandwidth:
+            return None
+        self.tokens = min(self.bandwidth, self.tokens + (now - self.last_refill) * self.bandwidth)
+        self.last_refill = now
+        return int(self.tokens)
+
+# Function to load a scenario file; returns a function that builds the
+# Scenario for a unit's nth connection. Settings in [DEFAULT] apply to every
+# unit and a [unit N] section overrides them for unit N (counting from 0).
+def load_scenario(path, seed=None):
+    parser = configparser.ConfigParser(defaults=SCENARIO_DEFAULTS, inline_comment_prefixes=('#',))
+    if not parser.read(path):
+        raise OSError(f"Could not read scenario file {path}")
+    if seed is not None:
+        parser['DEFAULT']['seed'] = str(seed)
+
+    def scenario_for(unit_index, connection_index):
+        section = f"unit {unit_index}"
+        settings = parser[section] if parser.has_section(section) else parser['DEFAULT']
+        return Scenario(settings, f"{int(settings['seed'])}:{unit_index}:{connection_index}")
+    # Check the settings once so errors are reported at startup
+    scenario_for(0, 0)
+    return scenario_for
+
+# Class holding the state of one client connection
+class Connection:
+    def __init__(self, conn, addr, unit, scenario=None):
+        self.conn = conn
+        self.addr = addr
+        self.unit = unit
+        self.scenario = scenario
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.delayed = deque()  # (due time, response) waiting for their latency
+        self.wake = None  # When delayed responses or bandwidth next need attention
+
+# Function to handle network communication. Each unit listens on its own port
+# (port, port + 1, ...) with its own register file; any number of clients can
+# connect to each unit at the same time. scenario_for (see load_scenario)
+# adds latency, bandwidth limits and faults to every connection.
+def handle_network_communication(host='127.0.0.1', port=65432, units=1, verbose=True, scenario_for=None):
+    selector = selectors.DefaultSelector()
+    connection_counts = [0] * units
+    waiting = set()  # Connections with a wake time
+    for index in range(units):
+        # Create a TCP socket
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        # Bind the socket to an address and port
+        server_socket.bind((host, port + index))
+
+        # Start listening for incoming connections
+        server_socket.listen(128)
+        server_socket.setblocking(False)
+        selector.register(server_socket, selectors.EVENT_READ, RegisterFile(index))
+    if units == 1:
+        print(f"Server listening on {host}:{port}")
+    else:
+        print(f"Server listening on {host}:{port}-{port + units - 1} ({units} units)")
 
     while True:
-        # Accept a new connection
-        conn, addr = server_socket.accept()
-        print(f"Connected by {addr}")
-
-        while True:
-            # Receive data from the client
-            data = conn.recv(4)  # Buffer size is 4 bytes
-            if not data:
-                break
-
-            if len(data) == 4:  # Common packet structure 4 bytes
-                address_bits, data_bits = struct.unpack('<HH', data)  # Little-endian format
-                rw_bit = (address_bits >> 15) & 0x1  # Extract rw_bit from the most significant bit of address_bits
-                address_bits = address_bits & 0x7FFF  # Mask out the rw_bit
-
-                print(f"Received packet: RW={rw_bit}, Address={address_bits:04X}, Data={data_bits:04X}")
-
-                # Respond based on the received command
-                if rw_bit == 1:  # Read command
-                    if address_bits == 0x602B:  # Check if address is 0x602B
-                        response = struct.pack('!I', 0b11100000001010110000111100000000)  # Respond with 11100000001010110000000000001111
-                    else:
-                        response = struct.pack('!I', 0b11100000001010110000000100000000)  # Respond with 11100000001010110000000000000001
-                    conn.sendall(response)
-                # No response for write command
+        timeout = max(0.0, min(connection.wake for connection in waiting) - time.monotonic()) if waiting else None
+        for key, events in selector.select(timeout):
+            if isinstance(key.data, RegisterFile):
+                # Accept a new connection
+                conn, addr = key.fileobj.accept()
+                conn.setblocking(False)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                unit = key.data
+                scenario = scenario_for(unit.index, connection_counts[unit.index]) if scenario_for else None
+                connection_counts[unit.index] += 1
+                selector.register(conn, selectors.EVENT_READ, Connection(conn, addr, unit, scenario))
+                if verbose:
+                    print(f"Connected by {addr}")
             else:
-                response = struct.pack('!I', 0xAAAA)  # Respond with "Invalid Packet" in hex (little-endian)
-                conn.sendall(response)
-        conn.close()
+                service_connection(selector, key.data, events, verbose)
+                update_waiting(waiting, key.data)
+        # Release responses whose latency has passed
+        now = time.monotonic()
+        for connection in [connection for connection in waiting if connection.wake <= now]:
+            flush_output(selector, connection, verbose)
+            update_waiting(waiting, connection)
+
+def update_waiting(waiting, connection):
+    if connection.wake is None or connection.conn.fileno() < 0:
+        waiting.discard(connection)
+    else:
+        waiting.add(connection)
+
+# Function to read, process and answer whatever a client has sent
+def service_connection(selector, connection, events, verbose):
+    if events & selectors.EVENT_READ:
+        try:
+            data = connection.conn.recv(RECV_SIZE)
+        except ConnectionError:
+            data = b''
+        if not data:
+            close_connection(selector, connection, verbose)
+            return
+        # Decode every complete packet at once; a partial packet at the end
+        # waits in inbuf for the rest of its bytes
+        if connection.inbuf:
+            connection.inbuf.extend(data)
+            data = connection.inbuf
+        complete = len(data) - len(data) % PACKET_SIZE
+        with memoryview(data) as view:
+            responses = connection.unit.handle_packets(view[:complete], verbose)
+        if data is connection.inbuf:
+            del connection.inbuf[:complete]
+        elif complete < len(data):
+            connection.inbuf.extend(data[complete:])
+        if connection.scenario:
+            if not schedule_responses(connection, responses):
+                reset_connection(selector, connection, verbose)
+                return
+        else:
+            connection.outbuf.extend(responses)
+    flush_output(selector, connection, verbose)
+
+# Function to queue responses behind their simulated latency and faults;
+# returns False if the connection should be reset
+def schedule_responses(connection, responses):
+    scenario = connection.scenario
+    now = time.monotonic()
+    due = connection.delayed[-1][0] if connection.delayed else now
+    for offset in range(0, len(responses), PACKET_SIZE):
+        response, reset = scenario.apply_faults(responses[offset:offset + PACKET_SIZE])
+        if reset:
+            return False
+        if response:
+            # Responses keep their order, so one can not overtake another
+            due = max(due, now + scenario.draw_latency())
+            connection.delayed.append((due, response))
+    return True
+
+# Function to send the responses that are due, within the bandwidth cap
+def flush_output(selector, connection, verbose):
+    now = time.monotonic()
+    delayed = connection.delayed
+    while delayed and delayed[0][0] <= now:
+        connection.outbuf.extend(delayed.popleft()[1])
+    connection.wake = delayed[0][0] if delayed else None
+    if connection.outbuf:
+        # All queued responses go out in a single send
+        allowance = connection.scenario.allowance(now) if connection.scenario else None
+        data = connection.outbuf if allowance is None else memoryview(connection.outbuf)[:allowance]
+        try:
+            sent = connection.conn.send(data) if data else 0
+        except BlockingIOError:
+            sent = 0
+        except ConnectionError:
+            close_connection(selector, connection, verbose)
+            return
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+        del connection.outbuf[:sent]
+        if allowance is not None:
+            connection.scenario.tokens -= sent
+            if connection.outbuf:
+                # Wake again once the cap allows another packet
+                refill = now + PACKET_SIZE / connection.scenario.bandwidth
+                connection.wake = min(connection.wake, refill) if connection.wake else refill
+    # Only wait for the socket to be writable while responses can be sent
+    waiting_on_socket = connection.outbuf and (connection.scenario is None or not connection.scenario.bandwidth)
+    wanted = selectors.EVENT_READ | (selectors.EVENT_WRITE if waiting_on_socket else 0)
+    if selector.get_key(connection.conn).events != wanted:
+        selector.modify(connection.conn, wanted, connection)
+
+# Function to drop a connection with a TCP reset instead of a normal close
+def reset_connection(selector, connection, verbose):
+    connection.conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+    if verbose:
+        print(f"Reset {connection.addr}")
+    close_connection(selector, connection, False)
+
+def close_connection(selector, connection, verbose):
+    if verbose:
+        print(f"Disconnected {connection.addr}")
+    selector.unregister(connection.conn)
+    connection.conn.close()
 
 # Function to handle serial communication
-def handle_serial_communication():
-    com_port = 'COM2'  # Change this to the desired COM port
+def handle_serial_communication(com_port='COM2', verbose=True):
     ser = serial.Serial(com_port, 9600, timeout=1)
     print(f"Server listening on {com_port}")
+    unit = RegisterFile()
 
     while True:
         data = ser.read(4)  # Buffer size is 4 bytes
@@ -61,28 +312,37 @@ def handle_serial_communication():
 
         if len(data) == 4:  # Common packet structure 4 bytes
             address_bits, data_bits = struct.unpack('<HH', data)  # Little-endian format
-            rw_bit = (address_bits >> 15) & 0x1  # Extract rw_bit from the most significant bit of address_bits
-            address_bits = address_bits & 0x7FFF  # Mask out the rw_bit
-
-            print(f"Received packet: RW={rw_bit}, Address={address_bits:04X}, Data={data_bits:04X}")
-
-            # Respond based on the received command
-            if rw_bit == 1:  # Read command
-                if address_bits == 0x602B:  # Check if address is 0x602B
-                    response = struct.pack('!I', 0b11100000001010110000111100000000)  # Respond with 11100000001010110000000000001111
-                else:
-                    response = struct.pack('!I', 0b11100000001010110000000100000000)  # Respond with 11100000001010110000000000000001
+            response = unit.handle_packet(address_bits, data_bits, verbose)
+            if response:
                 ser.write(response)
-            # No response for write command
         else:
             response = struct.pack('!I', 0xAAAA)  # Respond with "Invalid Packet" in hex (little-endian)
             ser.write(response)
 
 if __name__ == "__main__":
-    connection_type = input("Enter connection type (network/com): ").strip().lower()
+    parser = argparse.ArgumentParser(description="SLC register simulator")
+    parser.add_argument('connection_type', nargs='?', choices=['network', 'com'], help="prompted for if not given")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=65432, help="first TCP port (default 65432)")
+    parser.add_argument('--units', type=int, default=1, help="number of simulated units, one port each (default 1)")
+    parser.add_argument('--com-port', default='COM2', help="serial port for 'com' (default COM2)")
+    parser.add_argument('--quiet', action='store_true', help="do not print every packet")
+    parser.add_argument('--scenario', help="scenario file with latency, bandwidth and fault settings")
+    parser.add_argument('--seed', type=int, help="override the scenario seed")
+    args = parser.parse_args()
+
+    scenario_for = None
+    if args.scenario:
+        try:
+            scenario_for = load_scenario(args.scenario, args.seed)
+        except (OSError, ValueError, configparser.Error) as e:
+            print(f"Error: Invalid scenario file. Details: {e}")
+            sys.exit(1)
+
+    connection_type = args.connection_type or input("Enter connection type (network/com): ").strip().lower()
     if connection_type == "network":
-        handle_network_communication()
+        handle_network_communication(args.host, args.port, args.units, not args.quiet, scenario_for)
     elif connection_type == "com":
-        handle_serial_communication()
+        handle_serial_communication(args.com_port, not args.quiet)
     else:
-        print("Invalid connection type. Please enter 'network' or 'com'.")
\ No newline at end of file
+        print("Invalid connection type. Please enter 'network' or 'com'.")
@@ -8,11 +8,19 @@ from datetime import datetime, timedelta, timezone
 import sys
 import select
 import threading
+import atexit
+import asyncio
+import argparse
+import json
+from collections import deque, namedtuple
+
+import serial
+import serial.aio
+from slc_capture import CaptureWriter, RW_WRITE, RW_READ, RW_VERIFY, STATUS_OK, STATUS_MISMATCH, STATUS_PARTIAL, STATUS_NO_RESPONSE
 
 # Import msvcrt for detecting key presses on Windows
 if os.name == 'nt':
     import msvcrt
-    import serial
 else:
     import termios
     import tty
@@ -26,34 +34,117 @@ RED = '\033[91m'
 YELLOW = '\033[93m'
 RESET = '\033[0m'
 
+# Pipeline defaults (override with window= and pacing= in config.ini)
+DEFAULT_WINDOW = 16  # Maximum number of read requests in flight
+DEFAULT_PACING = 0.0  # Seconds to wait between commands
+RESPONSE_SIZE = 4  # Every read response is a 4-byte frame
+
+# Delta logging defaults (enable with delta=on in config.ini)
+DEFAULT_KEYFRAME = 60.0  # Seconds between keyframes of all last values
+
+# Config keys that are settings rather than command aliases
+CONFIG_KEYS = ['product', 'address', 'port', 'window', 'pacing', 'delta', 'keyframe', 'capture']
+
+# Session log settings
+LOG_HEADER = ["Timestamp", "Message", "RW", "Address", "Value"]
+LOG_BATCH_SIZE = 256  # Rows buffered before the writer thread is woken
+LOG_FLUSH_INTERVAL = 1.0  # Maximum seconds a row waits before being written
+
+# Adelaide time and the pattern used to strip ANSI escape codes from log messages
+ADELAIDE_TZ = timezone(timedelta(hours=10.5))
+ANSI_ESCAPE = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
+
+# Class to keep the session log open and write rows in batches from a background thread
+class SessionLogger:
+    def __init__(self, path, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # Keeps batches in order when flush() is called directly
+        self._closed = False
+        self._file = open(path, mode='w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(LOG_HEADER)
+        self._file.flush()
+        self._thread = threading.Thread(target=self._write_loop, name="SessionLogger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Queue one row; the writer thread is woken once a full batch is waiting
+    def log(self, timestamp, message, rw="", address="", value=""):
+        with self._condition:
+            self._rows.append((timestamp, message, rw, address, value))
+            if len(self._rows) >= self.batch_size:
+                self._condition.notify()
+
+    # Write everything queued so far without waiting for the thread
+    def flush(self):
+        with self._write_lock:
+            with self._condition:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                self._writer.writerows(rows)
+                self._file.flush()
+            except OSError as e:
+                print(f"{RED}Error: Could not write to {self.path}. Details: {e}{RESET}")
+
+    # Write remaining rows and close the file (also run at exit)
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._file.close()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or len(self._rows) >= self.batch_size, self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
 # Ensure the SLC_LOG directory exists
 log_dir = "SLC_LOG"
 os.makedirs(log_dir, exist_ok=True)
 
 # Generate a unique log file name based on the current date and time
-session_time = datetime.now(timezone(timedelta(hours=10.5))).strftime('%Y-%m-%d_%H-%M-%S')  # Adelaide time
+session_time = datetime.now(ADELAIDE_TZ).strftime('%Y-%m-%d_%H-%M-%S')  # Adelaide time
 log_file = os.path.join(log_dir, f"slc_command_log_{session_time}.csv")
 
-# Write the header to the CSV file
-with open(log_file, mode='w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerow(["Timestamp", "Message", "RW", "Address", "Value"])
+# Open the session log (writes the header)
+session_log = SessionLogger(log_file)
+
+# Binary capture of every sample, opened by main() when capture=on
+capture = None
+capture_file = os.path.join(log_dir, f"slc_capture_{session_time}.slc")
 
 # Function to log messages to CSV
 def log_to_csv(timestamp, message, rw="", address="", value=""):
     # Remove ANSI escape codes from the message
-    ansi_escape = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
-    message = ansi_escape.sub('', message)
-    try:
-        with open(log_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, message, rw, address, value])
-    except PermissionError:
-        print(f"{RED}Error: Permission denied when writing to {log_file}.{RESET}")
+    if '\x1b' in message:
+        message = ANSI_ESCAPE.sub('', message)
+    session_log.log(timestamp, message, rw, address, value)
+
+# Function to get the current Adelaide timestamp, formatted once per second
+_timestamp_cache = [None, '']
+def get_timestamp():
+    second = int(time.time())
+    if second != _timestamp_cache[0]:
+        _timestamp_cache[0] = second
+        _timestamp_cache[1] = datetime.fromtimestamp(second, ADELAIDE_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    return _timestamp_cache[1]
 
 # Function to print with timestamp and log to CSV
 def print_with_timestamp(message, rw="", address="", value=""):
-    timestamp = datetime.now(timezone(timedelta(hours=10.5))).strftime('%Y-%m-%d %H:%M:%S')  # Adelaide time
+    timestamp = get_timestamp()
     log_to_csv(timestamp, message, rw, address, value)
     print(f"[{timestamp}] {message}")
 
@@ -68,6 +159,8 @@ def get_user_input():
         print(f"Loaded from config file: Product={product}, Address={address}")
         if is_valid_ip(address) and port and port.isdigit() and 0 < int(port) < 65536:
             return product, "network", address, int(port)
+        elif is_valid_url(address):
+            return product, "url", address, None
         elif os.name == 'nt' and is_valid_com_port(address):
             return product, "com", address, None
         else:
@@ -82,7 +175,7 @@ def get_user_input():
             product = None
     
     while not address:
-        address_input = input("Enter IP Address or COM port: ").strip()
+        address_input = input("Enter IP Address, COM port or serial URL: ").strip()
         if is_valid_ip(address_input):
             connection_type = "network"
             address = address_input
@@ -92,6 +185,8 @@ def get_user_input():
                     print(f"{RED}Invalid port format. Please enter a number between 1 and 65535.{RESET}")
                     port = None
             return product, connection_type, address, int(port)
+        elif is_valid_url(address_input):
+            return product, "url", address_input, None
         elif os.name == 'nt' and is_valid_com_port(address_input):
             connection_type = "com"
             address = address_input
@@ -101,20 +196,30 @@ def get_user_input():
             except serial.SerialException as e:
                 print(f"{RED}Error: Could not open COM port {address}. Details: {e}{RESET}")
         else:
-            print(f"{RED}Invalid input. Please enter a valid IP address or COM port.{RESET}")
+            print(f"{RED}Invalid input. Please enter a valid IP address, COM port or serial URL.{RESET}")
 
-# Function to read config file
+# Function to read config file (re-read only when config.ini changes)
+_config_cache = [None, {}]
 def read_config():
+    mtime = os.path.getmtime('config.ini') if os.path.isfile('config.ini') else None
+    if mtime == _config_cache[0]:
+        return _config_cache[1]
     config = {}
-    if os.path.isfile('config.ini'):
+    if mtime is not None:
         with open('config.ini', 'r') as file:
             for line in file:
                 line = line.strip()
                 if line and not line.startswith('#'):
                     key, value = line.split('=', 1)
                     config[key.strip()] = value.strip()
+    _config_cache[:] = [mtime, config]
+    _program_cache.clear()  # Aliases may have changed
     return config
 
+# Function to get the command aliases from the config file
+def get_aliases(config):
+    return {k.lower(): v for k, v in config.items() if k.lower() not in CONFIG_KEYS}
+
 # Function to validate IP address
 def is_valid_ip(ip):
     try:
@@ -127,14 +232,46 @@ def is_valid_ip(ip):
 def is_valid_com_port(port):
     return re.fullmatch(r'COM\d+', port, re.IGNORECASE) is not None
 
+# Function to validate a serial device path on Linux and macOS (e.g. /dev/ttyUSB0)
+def is_valid_device_path(port):
+    return os.name != 'nt' and port.startswith('/dev/')
+
+# Function to validate serial URL (e.g. loop://, socket://host:port, rfc2217://host:port)
+def is_valid_url(address):
+    return re.fullmatch(r'[a-z0-9]+://.*', address, re.IGNORECASE) is not None
+
+# Function to parse a fleet target (IP:PORT, COM port, device path or serial
+# URL) into (connection_type, address, port); returns None if the target is invalid
+def parse_target(text):
+    if is_valid_url(text):
+        return "url", text, None
+    if (os.name == 'nt' and is_valid_com_port(text)) or is_valid_device_path(text):
+        return "com", text, None
+    address, _, port = text.rpartition(':')
+    if is_valid_ip(address) and port.isdigit() and 0 < int(port) < 65536:
+        return "network", address, int(port)
+    return None
+
 # Function to validate 16-bit hexadecimal value
 def is_valid_hex(value):
     return bool(re.fullmatch(r'^[0-9A-Fa-f]{1,4}$', value))
 
+# Function to expand an address range (START..END) or list (A,B,C) into
+# address strings; returns None if the text is not a valid block
+def parse_address_block(text):
+    if '..' in text:
+        start, _, end = text.partition('..')
+        if not (is_valid_hex(start) and is_valid_hex(end)) or int(start, 16) > int(end, 16):
+            return None
+        return [f"{address:04X}" for address in range(int(start, 16), int(end, 16) + 1)]
+    if ',' in text:
+        addresses = [address for address in text.split(',') if address]
+        if addresses and all(is_valid_hex(address) for address in addresses):
+            return addresses
+    return None
+
 # Function to get user commands from input or file
-def get_user_commands():
-    config = read_config()
-    aliases = {k.lower(): v for k, v in config.items() if k.lower() not in ['product', 'address', 'port']}
+def get_user_commands(product):
     timeout = 600  # 10 minutes timeout in seconds
 
     while True:
@@ -149,70 +286,186 @@ def get_user_commands():
             print("Command format:")
             print("  Read: r <address>")
             print("  Write: w <address> <value>")
+            print("  Block read: r <start>..<end> or r <address>,<address>,...")
+            print("  Block write: w <start>..<end> <value> [<value> ...] (one value for all, or one per address)")
             print("  Delay: delay=<seconds>")
             print("  Continuous transmission: cont")
             print("  Load from file: <filename without extension>.txt")
             print("  Comments: #<comment>")
-            print("Example: r 1234; w 5678 9ABC; delay=2; cont")
+            print("  Benchmark: bench [<count>] [window=<n>] [batch=<n>] [writes=<fraction>] [address=<hex>]")
+            print("Example: r 1234; w 5678 9ABC; r 0000..00FF; delay=2; cont")
             continue
 
-        # Remove trailing semicolon if present
-        if commands.endswith(';'):
-            commands = commands[:-1]
-
-        command_list = commands.split(';')
-        parsed_commands = []
-        continuous_flag = False
-        for command in command_list:
-            command = command.strip()
-            command_lower = command.lower()
-            if command_lower in aliases:
-                if os.path.isfile(command + ".txt"):
-                    print(f"{YELLOW}Warning: Both a text file and a config file alias have the name '{command}'. The config file alias will take precedence.{RESET}")
-                command = aliases[command_lower]
-                command_list.extend(command.split(';'))
-                continue
-            if command.endswith('.txt'):
-                file_name = command
-            else:
-                file_name = command + ".txt"
-            if os.path.isfile(file_name):
-                with open(file_name, 'r') as file:
-                    file_commands = file.read().strip()
-                if file_commands.endswith(';'):
-                    file_commands = file_commands[:-1]
-                command_list.extend(file_commands.split(';'))
-                continue
-            if command.startswith('#'):
-                comment = command[1:].strip()
-                print_with_timestamp(f"Comment: {comment}")
-                continue
-            if command.startswith('delay='):
-                try:
-                    delay = float(command.split('=')[1])
-                    parsed_commands.append(('delay', delay))
-                except ValueError:
-                    print(f"{RED}Invalid delay format: {command}. Use delay=xx where xx is the number of seconds.{RESET}")
-                continue
-            if command == 'cont':
-                continuous_flag = True
-                continue
-            if not command:
-                continue
-            parts = command.split()
-            if len(parts) == 2 and parts[0] == 'r' and is_valid_hex(parts[1]):
-                rw, address = parts
-                parsed_commands.append((rw, address, None))
-            elif len(parts) == 3 and parts[0] == 'w' and is_valid_hex(parts[1]) and is_valid_hex(parts[2]):
-                rw, address, val = parts
-                parsed_commands.append((rw, address, val))
+        if commands.lower().split()[:1] == ['bench']:
+            return parse_bench_options(commands.split()[1:])
+
+        return load_program(product, commands, get_aliases(read_config()))
+
+# Benchmark settings: count transactions of which the given fraction are
+# writes (each write is verified by a read), sent in groups of batch frames
+# with at most window responses outstanding, cycling over 256 registers from address
+BenchOptions = namedtuple('BenchOptions', ['count', 'window', 'batch', 'writes', 'address'])
+BENCH_SPAN = 256
+
+# Function to parse the options of the bench command; returns (valid, options)
+def parse_bench_options(tokens, window=None):
+    count, batch, writes, address = 10000, 1, 0.0, 0
+    if window is None:
+        window = get_pipeline_settings(read_config())[0]
+    try:
+        for token in tokens:
+            key, _, value = token.lower().partition('=')
+            if not value and key.isdigit():
+                count = int(key)
+            elif key == 'window':
+                window = int(value)
+            elif key == 'batch':
+                batch = int(value)
+            elif key == 'writes':
+                writes = float(value)
+            elif key == 'address' and is_valid_hex(value):
+                address = int(value, 16) & 0x7FFF
             else:
-                print(f"{RED}Invalid command format: {command}. Type 'help' for command format.{RESET}")
-                return False, [], continuous_flag
-        return True, parsed_commands, continuous_flag
+                raise ValueError(token)
+        if count < 1 or window < 1 or batch < 1 or not 0 <= writes <= 1:
+            raise ValueError(tokens)
+    except ValueError:
+        print(f"{RED}Invalid bench options. Use: bench [<count>] [window=<n>] [batch=<n>] [writes=<fraction>] [address=<hex>]{RESET}")
+        return False, None
+    return True, BenchOptions(count, window, batch, writes, address)
+
+# Exception raised when a command cannot be compiled
+class CommandError(ValueError):
+    pass
+
+# Exception raised when responses stop part way through a frame or block.
+# The responses after it can not be matched to their requests any more, so
+# the program is stopped, as for a timeout.
+class ResponseError(Exception):
+    pass
+
+# A compiled command program. Each op is ('delay', seconds),
+# ('request', packet, entry) or ('block', packet, entries), where packet holds
+# the pre-packed request frames and each entry is (rw, address, val, expected,
+# register) with register the 15-bit address as an int
+# for one response. messages are comments and warnings shown when the program
+# is loaded, and files records (path, mtime) of every command file it includes.
+Program = namedtuple('Program', ['ops', 'messages', 'continuous', 'files'])
+
+# Compiled programs keyed by ('alias', product, text) or ('file', product, path),
+# and compiled single commands keyed by (product, command)
+_program_cache = {}
+_command_cache = {}
+
+# Function to compile commands and show their messages; returns (valid, program)
+def load_program(product, commands, aliases):
+    try:
+        program = compile_program(product, commands, aliases)
+    except CommandError as e:
+        print(f"{RED}{e}{RESET}")
+        return False, None
+    for kind, text in program.messages:
+        if kind == 'comment':
+            print_with_timestamp(f"Comment: {text}")
+        else:
+            print(f"{YELLOW}Warning: {text}{RESET}")
+    return True, program
+
+# Function to compile a ';' separated command string, expanding aliases and command files
+def compile_program(product, commands, aliases, _seen=()):
+    # Remove trailing semicolon if present
+    commands = commands.strip()
+    if commands.endswith(';'):
+        commands = commands[:-1]
+
+    ops, messages, files = [], [], []
+    continuous_flag = False
+    for command in commands.split(';'):
+        command = command.strip()
+        command_lower = command.lower()
+        file_name = command if command.endswith('.txt') else command + ".txt"
+        if command_lower in aliases:
+            if os.path.isfile(command + ".txt"):
+                messages.append(('warning', f"Both a text file and a config file alias have the name '{command}'. The config file alias will take precedence."))
+            alias = aliases[command_lower]
+            included = compile_cached(product, ('alias', product, alias), lambda: (alias, None), aliases, _seen)
+        elif command and os.path.isfile(file_name):
+            path = os.path.abspath(file_name)
+            included = compile_cached(product, ('file', product, path), lambda: read_command_file(path), aliases, _seen)
+        else:
+            included = None
+        if included:
+            ops.extend(included.ops)
+            messages.extend(included.messages)
+            files.extend(included.files)
+            continuous_flag = continuous_flag or included.continuous
+            continue
+        if command.startswith('#'):
+            messages.append(('comment', command[1:].strip()))
+            continue
+        if command.startswith('delay='):
+            try:
+                ops.append(('delay', float(command.split('=')[1])))
+            except ValueError:
+                messages.append(('warning', f"Invalid delay format: {command}. Use delay=xx where xx is the number of seconds."))
+            continue
+        if command == 'cont':
+            continuous_flag = True
+            continue
+        if not command:
+            continue
+        ops.append(compile_command(product, command))
+    return Program(tuple(ops), tuple(messages), continuous_flag, tuple(files))
+
+# Function to read a command file; returns its text and (path, mtime)
+def read_command_file(path):
+    mtime = os.path.getmtime(path)
+    with open(path, 'r') as file:
+        return file.read(), (path, mtime)
+
+# Function to compile an alias or command file, reusing the cached program
+# while none of the command files it includes have changed. read_commands
+# returns the command text and the (path, mtime) it came from, if any.
+def compile_cached(product, key, read_commands, aliases, seen):
+    if key in seen:
+        raise CommandError(f"Invalid command format: recursive alias or command file ({key[2]}).")
+    program = _program_cache.get(key)
+    if program is None or any(not os.path.isfile(path) or os.path.getmtime(path) != mtime for path, mtime in program.files):
+        commands, dependency = read_commands()
+        program = compile_program(product, commands, aliases, seen + (key,))
+        if dependency:
+            program = program._replace(files=program.files + (dependency,))
+        _program_cache[key] = program
+    return program
+
+# Function to compile one read/write command into an op with packed frames
+def compile_command(product, command):
+    op = _command_cache.get((product, command))
+    if op is not None:
+        return op
+    parts = command.split()
+    addresses = parse_address_block(parts[1]) if len(parts) >= 2 else None
+    if len(parts) == 2 and parts[0] == 'r' and addresses:
+        entries = tuple(('r', address, None, None, int(address, 16) & 0x7FFF) for address in addresses)
+        op = ('block', create_block_packet(product, 'r', addresses), entries)
+    elif len(parts) >= 3 and parts[0] == 'w' and addresses and len(parts) - 2 in (1, len(addresses)) and all(is_valid_hex(v) for v in parts[2:]):
+        values = parts[2:] * len(addresses) if len(parts) == 3 else parts[2:]
+        entries = tuple(('w', address, val, int(val, 16), int(address, 16) & 0x7FFF) for address, val in zip(addresses, values))
+        op = ('block', create_block_packet(product, 'w', addresses, values), entries)
+    elif len(parts) == 2 and parts[0] == 'r' and is_valid_hex(parts[1]):
+        op = ('request', create_data_packet(product, 'r', parts[1]), ('r', parts[1], None, None, int(parts[1], 16) & 0x7FFF))
+    elif len(parts) == 3 and parts[0] == 'w' and is_valid_hex(parts[1]) and is_valid_hex(parts[2]):
+        # Write followed by a read back to verify
+        packet = create_data_packet(product, 'w', parts[1], parts[2]) + create_data_packet(product, 'r', parts[1])
+        op = ('request', packet, ('w', parts[1], parts[2], int(parts[2], 16), int(parts[1], 16) & 0x7FFF))
+    else:
+        raise CommandError(f"Invalid command format: {command}. Type 'help' for command format.")
+    _command_cache[(product, command)] = op
+    return op
 
 def timeout_handler():
     print(f"{RED}Session timed out due to inactivity.{RESET}")
+    session_log.close()  # os._exit skips the atexit flush
     os._exit(1)
 
 # Function to create a data packet
@@ -228,6 +481,566 @@ def create_data_packet(product, rw, address, val=None):
     packet = struct.pack('<H', address_bits) + struct.pack('<H', data_bits)
     return packet
 
+# Function to read the pipeline window and pacing from the config file
+def get_pipeline_settings(config):
+    window, pacing = DEFAULT_WINDOW, DEFAULT_PACING
+    if config.get('window'):
+        if config['window'].isdigit() and int(config['window']) > 0:
+            window = int(config['window'])
+        else:
+            print(f"{RED}Invalid window in config file. Using {DEFAULT_WINDOW}.{RESET}")
+    if config.get('pacing'):
+        try:
+            pacing = max(0.0, float(config['pacing']))
+        except ValueError:
+            print(f"{RED}Invalid pacing in config file. Using {DEFAULT_PACING}.{RESET}")
+    return window, pacing
+
+# Function to check whether a config setting is switched on
+def is_enabled(config, key):
+    return config.get(key, '').lower() in ('on', 'true', 'yes', '1')
+
+# Function to open the binary capture file if capture=on in the config file
+def start_capture(config):
+    global capture
+    if is_enabled(config, 'capture') and capture is None:
+        capture = CaptureWriter(capture_file)
+        print(f"Capturing samples to {capture_file}")
+
+# Function to read the delta logging settings from the config file; returns
+# the keyframe interval in seconds, or None when delta logging is off
+def get_delta_settings(config):
+    if not is_enabled(config, 'delta'):
+        return None
+    keyframe = DEFAULT_KEYFRAME
+    if config.get('keyframe'):
+        try:
+            keyframe = float(config['keyframe'])
+            if keyframe <= 0:
+                raise ValueError
+        except ValueError:
+            print(f"{RED}Invalid keyframe in config file. Using {DEFAULT_KEYFRAME}.{RESET}")
+            keyframe = DEFAULT_KEYFRAME
+    return keyframe
+
+# Base class for a connection to a unit. Subclasses provide send and
+# recv_exact; recv_exact returns fewer bytes than requested only if the
+# connection timed out or was closed part way through a frame. eof is set
+# once the unit has closed the connection.
+class Transport:
+    eof = False
+
+    def send(self, data):
+        raise NotImplementedError
+
+    def recv_exact(self, size):
+        raise NotImplementedError
+
+    # Fill a caller-supplied buffer; returns the number of bytes received
+    def recv_exact_into(self, view):
+        data = self.recv_exact(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def transact(self, data, size):
+        self.send(data)
+        return self.recv_exact(size)
+
+    def close(self):
+        pass
+
+# Transport for a TCP connection (socket.timeout is raised if nothing arrives)
+class TcpTransport(Transport):
+    def __init__(self, address, port, timeout=5):
+        self.name = f"{address}:{port}"
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self._buffer = bytearray(RESPONSE_SIZE)
+        try:
+            self.socket.connect((address, port))
+        except Exception:
+            self.socket.close()
+            raise
+
+    def send(self, data):
+        self.socket.sendall(data)
+
+    # Accumulate into the buffer with recv_into until it is full. A timeout
+    # with nothing received raises socket.timeout; a timeout or close part
+    # way through returns the number of bytes received so far.
+    def recv_exact_into(self, view):
+        size = len(view)
+        received = 0
+        while received < size:
+            try:
+                count = self.socket.recv_into(view[received:])
+            except socket.timeout:
+                if not received:
+                    raise
+                break
+            if not count:
+                self.eof = True
+                break
+            received += count
+        return received
+
+    # Receive exactly size bytes via a preallocated buffer (partial frames
+    # are returned as described for recv_exact_into)
+    def recv_exact(self, size):
+        if len(self._buffer) < size:
+            self._buffer = bytearray(size)
+        view = memoryview(self._buffer)
+        return bytes(view[:self.recv_exact_into(view[:size])])
+
+    def close(self):
+        self.socket.close()
+
+# Transport for a serial port instance from the serial package
+class SerialTransport(Transport):
+    def __init__(self, ser, name=None):
+        self.name = name or ser.port
+        self.serial = ser
+
+    @classmethod
+    def open_port(cls, port, baudrate=9600, timeout=1):
+        return cls(serial.Serial(port, baudrate, timeout=timeout), port.upper() if os.name == 'nt' else port)
+
+    @classmethod
+    def open_url(cls, url, baudrate=9600, timeout=1):
+        return cls(serial.serial_for_url(url, baudrate, timeout=timeout), url)
+
+    def send(self, data):
+        self.serial.write(data)
+
+    # serial.read() blocks until size bytes or the timeout, which is for the
+    # whole read. Keep reading while data arrives, so the timeout only ends a
+    # silence, as for TcpTransport, and a long block at a low baud rate is
+    # not cut short.
+    def recv_exact(self, size):
+        data = self.serial.read(size)
+        while data and len(data) < size:
+            more = self.serial.read(size - len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    def recv_exact_into(self, view):
+        received = self.serial.readinto(view)
+        while received and received < len(view):
+            count = self.serial.readinto(view[received:])
+            if not count:
+                break
+            received += count
+        return received
+
+    def close(self):
+        self.serial.close()
+
+# Function to report the data word read back for a read or write-verify
+# entry. A write is reported together with its read back, so the log follows
+# the order of the requests.
+def report_data_word(entry, data_word, prefix=""):
+    rw, address, val, expected, register = entry
+    report_write(entry, prefix)
+    if capture:
+        if rw == 'w':
+            capture.record(RW_VERIFY, register, data_word, STATUS_OK if data_word == expected else STATUS_MISMATCH, expected)
+        else:
+            capture.record(RW_READ, register, data_word)
+    if rw == 'w':
+        if data_word == expected:
+            print_with_timestamp(f"{prefix}Write Verified. Address: {address} Data: 0x{data_word:04X} ({data_word})", 'r', address, val)
+        else:
+            print_with_timestamp(f"{prefix}{RED}Write Error: Different Value Read Back. Address: {address} Data: 0x{data_word:04X} ({data_word}){RESET}", 'r', address, val)
+    else:
+        print_with_timestamp(f"{prefix}Read Complete. Address: {address} Data: 0x{data_word:04X} ({data_word})", rw, address)
+
+# Function to report the response to a read or write-verify entry; raises
+# ResponseError for a partial frame
+def handle_response(entry, response, prefix="", report=report_data_word):
+    if len(response) < RESPONSE_SIZE:
+        report_missing((entry,), response, prefix)
+        if response:
+            raise ResponseError(f"partial response for address {entry[1]}")
+        return
+    data_word = struct.unpack('<H', response[2:4])[0]  # Extract 4th byte followed by 3rd byte
+    report(entry, data_word, prefix)
+
+# Function to report entries whose responses did not arrive: the first one
+# with the bytes received for it, if any. Writes among them were sent, so
+# they are still logged.
+def report_missing(entries, response, prefix=""):
+    rw, address, val, expected, register = entries[0]
+    report_write(entries[0], prefix)
+    if capture:
+        capture.record(RW_VERIFY if rw == 'w' else RW_READ, register, 0, STATUS_PARTIAL if response else STATUS_NO_RESPONSE, expected or 0)
+    if not response:
+        print(f"{prefix}{RED}Error: No response. Address: {address}{RESET}")
+    else:
+        print(f"{prefix}{RED}Error: Partial response. Address: {address} Received {len(response)} of {RESPONSE_SIZE} bytes: {bytes(response).hex()}{RESET}")
+    for entry in entries[1:]:
+        report_write(entry, prefix)
+
+# Function to report a write (called just before its read back is reported)
+def report_write(entry, prefix=""):
+    rw, address, val, expected, register = entry
+    if rw == 'w':
+        if capture:
+            capture.record(RW_WRITE, register, expected)
+        print_with_timestamp(f"{prefix}Write Complete. Address: {address}, Value: {val}", rw, address, val)
+
+# Function to build the request frames for a block command as one buffer
+def create_block_packet(product, rw, addresses, values=None):
+    if rw == 'w':
+        # Each write is followed by a read back to verify
+        return b''.join(create_data_packet(product, 'w', address, val) + create_data_packet(product, 'r', address)
+                        for address, val in zip(addresses, values))
+    return b''.join(create_data_packet(product, 'r', address) for address in addresses)
+
+# Function to report the responses to a block, decoded all at once; raises
+# ResponseError if the block stopped short
+def report_block(entries, response, prefix="", report=report_data_word):
+    complete = len(response) // RESPONSE_SIZE
+    for entry, (_, data_word) in zip(entries, struct.iter_unpack('<HH', response[:complete * RESPONSE_SIZE])):
+        report(entry, data_word, prefix)
+    if complete < len(entries):
+        # Report the first missing frame precisely and skip the rest of the block
+        report_missing(entries[complete:], response[complete * RESPONSE_SIZE:], prefix)
+        print(f"{prefix}{RED}Error: Block stopped after {complete} of {len(entries)} responses.{RESET}")
+        raise ResponseError(f"block stopped after {complete} of {len(entries)} responses")
+
+# Function to receive a block's responses; if the transport times out, the
+# block's writes are logged before the timeout is passed on
+async def receive_block(entries, transport, prefix="", report=report_data_word):
+    try:
+        response = await transport.recv_exact(RESPONSE_SIZE * len(entries))
+    except socket.timeout:
+        report_missing(entries, b'', prefix)
+        raise
+    report_block(entries, response, prefix, report)
+
+# Function to receive and report the response for the oldest pending entry;
+# if the transport times out, the pending writes are logged before the
+# timeout is passed on
+async def receive_pending(pending, transport, prefix="", report=report_data_word):
+    entry = pending.popleft()
+    try:
+        response = await transport.recv_exact(RESPONSE_SIZE)
+    except socket.timeout:
+        report_missing((entry,) + tuple(pending), b'', prefix)
+        raise
+    handle_response(entry, response, prefix, report)
+
+# Function holding the op loop shared by run_pipelined and fleet mode: it runs
+# a compiled program with up to 'window' requests in flight. Writes get no
+# response, so only reads (including write read-backs) are queued; responses
+# arrive in order and are matched against the queue, and writes are reported
+# as their read backs come up so the log stays in order. transport is a
+# BlockingAdapter or a StreamTransport.
+async def run_ops(ops, transport, window=DEFAULT_WINDOW, pacing=DEFAULT_PACING, prefix="", report=report_data_word):
+    pending = deque()
+    for op in ops:
+        if op[0] == 'delay':
+            # A delay is a barrier: collect all outstanding responses first
+            while pending:
+                await receive_pending(pending, transport, prefix, report)
+            await transport.sleep(op[1])
+            continue
+        if op[0] == 'block':
+            # Blocks are sent as one buffer, so collect earlier responses first
+            while pending:
+                await receive_pending(pending, transport, prefix, report)
+            _, packet, entries = op
+            await transport.send(packet)
+            await receive_block(entries, transport, prefix, report)
+        else:
+            _, packet, entry = op
+            await transport.send(packet)
+            pending.append(entry)
+            while len(pending) >= window:
+                await receive_pending(pending, transport, prefix, report)
+        if pacing:
+            await transport.sleep(pacing)
+    while pending:
+        await receive_pending(pending, transport, prefix, report)
+
+# Adapter giving a blocking Transport the awaitable interface run_ops uses.
+# Its methods never suspend, so run_blocking can run the op loop without an
+# event loop.
+class BlockingAdapter:
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def send(self, data):
+        self.transport.send(data)
+
+    async def recv_exact(self, size):
+        return self.transport.recv_exact(size)
+
+    async def sleep(self, seconds):
+        time.sleep(seconds)
+
+# Function to run a coroutine that never suspends (see BlockingAdapter) to completion
+def run_blocking(coroutine):
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError("coroutine suspended outside an event loop")
+
+# Function to run a compiled program over a blocking transport
+def run_pipelined(ops, transport, window=DEFAULT_WINDOW, pacing=DEFAULT_PACING, prefix="", report=report_data_word):
+    run_blocking(run_ops(ops, BlockingAdapter(transport), window, pacing, prefix, report))
+
+# Class to report only changed read values during continuous polling. The
+# full last-value table is written to the log as a keyframe every
+# keyframe_interval seconds, with summary counters, so the log can be
+# reconstructed at any point in time.
+class DeltaReporter:
+    def __init__(self, keyframe_interval=DEFAULT_KEYFRAME):
+        self.keyframe_interval = keyframe_interval
+        self.last_values = {}
+        self.last_verified = {}  # Last data word read back after a write, by address
+        self.reads = 0
+        self.writes = 0
+        self.changes = 0
+        self.next_keyframe = time.monotonic() + keyframe_interval
+
+    # Function to report one data word (same signature as report_data_word)
+    def report(self, entry, data_word, prefix=""):
+        if entry[0] == 'w':
+            self.report_verify(entry, data_word, prefix)
+            return
+        self.reads += 1
+        address = entry[1]
+        last = self.last_values.get(address)
+        if last == data_word:
+            if capture:
+                capture.record(RW_READ, entry[4], data_word)  # The capture keeps every sample
+            return
+        self.last_values[address] = data_word
+        if last is None:
+            report_data_word(entry, data_word, prefix)
+        else:
+            self.changes += 1
+            if capture:
+                capture.record(RW_READ, entry[4], data_word)
+            print_with_timestamp(f"{prefix}Read Changed. Address: {address} Data: 0x{data_word:04X} ({data_word}) Previous: 0x{last:04X} ({last})", 'r', address)
+
+    # Function to report a write and its read back only the first time, when
+    # the value read back changes, or when it does not match the value written
+    def report_verify(self, entry, data_word, prefix=""):
+        self.writes += 1
+        rw, address, val, expected, register = entry
+        last = self.last_verified.get(address)
+        if data_word == expected and last == data_word:
+            if capture:
+                capture.record(RW_WRITE, register, expected)  # The capture keeps every sample
+                capture.record(RW_VERIFY, register, data_word, STATUS_OK, expected)
+            return
+        if last is not None:
+            self.changes += 1
+        self.last_verified[address] = data_word
+        report_data_word(entry, data_word, prefix)
+
+    # Function to write a keyframe once the interval has passed (called once per cycle)
+    def check_keyframe(self, prefix=""):
+        if time.monotonic() >= self.next_keyframe:
+            self.keyframe(prefix)
+
+    # Function to log every last value (to the CSV only) followed by the summary
+    def keyframe(self, prefix=""):
+        self.next_keyframe = time.monotonic() + self.keyframe_interval
+        timestamp = get_timestamp()
+        for address, data_word in self.last_values.items():
+            log_to_csv(timestamp, f"{prefix}Keyframe. Address: {address} Data: 0x{data_word:04X} ({data_word})", 'r', address)
+        self.summary(prefix)
+
+    def summary(self, prefix=""):
+        print_with_timestamp(f"{prefix}Delta Summary: {self.reads} reads, {self.writes} writes, {self.changes} changes, {len(self.last_values)} addresses")
+
+# Class holding a program's request frames in one contiguous buffer for
+# continuous mode. Frames are sent as memoryview slices and responses are
+# received into a preallocated buffer and read through a 16-bit view, so a
+# cycle does no packing, joining or unpacking.
+class ContinuousPlan:
+    def __init__(self, ops, window=DEFAULT_WINDOW):
+        count = sum(len(op[2]) if op[0] == 'block' else 1 for op in ops if op[0] != 'delay')
+        self.requests = bytearray(b''.join(op[1] for op in ops if op[0] != 'delay'))
+        self.responses = bytearray(RESPONSE_SIZE * count)
+        request_view = memoryview(self.requests)
+        response_view = memoryview(self.responses)
+        # Data words are every second 16-bit word of the responses
+        self.words = response_view.cast('H') if sys.byteorder == 'little' else None
+        # Steps are ('delay', seconds) or ('send', requests, responses, entries, first word)
+        self.steps = []
+        chunk_size = max(1, window // 2)  # Two chunks in flight keeps at most 'window' requests outstanding
+        sent = received = 0
+        chunk = []
+        for op in ops + (('delay', 0),):
+            if op[0] == 'request' and len(chunk) < chunk_size and (not chunk or chunk[-1][0] == 'request'):
+                chunk.append(op)
+                continue
+            if chunk:
+                size = sum(len(item[1]) for item in chunk)
+                chunk_entries = tuple(entry for item in chunk for entry in (item[2] if item[0] == 'block' else (item[2],)))
+                self.steps.append(('send', request_view[sent:sent + size],
+                                   response_view[received:received + RESPONSE_SIZE * len(chunk_entries)],
+                                   chunk_entries, received // 2 + 1))
+                sent += size
+                received += RESPONSE_SIZE * len(chunk_entries)
+                chunk = []
+            if op[0] == 'delay':
+                if op[1]:
+                    self.steps.append(op)
+            else:
+                chunk.append(op)
+        self.steps = tuple(self.steps)
+
+    # Function to run one cycle of the plan; each chunk is sent before the
+    # previous chunk's responses are received
+    def run(self, transport, prefix="", report=report_data_word):
+        in_flight = None
+        for step in self.steps:
+            if step[0] == 'delay':
+                if in_flight:
+                    self.receive(in_flight, transport, prefix, report)
+                in_flight = None
+                time.sleep(step[1])
+                continue
+            transport.send(step[1])
+            if in_flight:
+                self.receive(in_flight, transport, prefix, report, step[3])
+            in_flight = step
+        if in_flight:
+            self.receive(in_flight, transport, prefix, report)
+
+    # Function to receive and report one chunk's responses; raises
+    # ResponseError if some were missing. sent_after holds the entries of the chunk sent after
+    # this one, whose writes are logged if the transport times out.
+    def receive(self, step, transport, prefix, report, sent_after=()):
+        _, _, responses, entries, word = step
+        try:
+            received = transport.recv_exact_into(responses)
+        except socket.timeout:
+            report_missing(entries + sent_after, b'', prefix)
+            raise
+        complete = received // RESPONSE_SIZE
+        words = self.words
+        for index in range(complete):
+            if words is not None:
+                data_word = words[word + 2 * index]
+            else:
+                data_word = struct.unpack_from('<H', responses, RESPONSE_SIZE * index + 2)[0]
+            report(entries[index], data_word, prefix)
+        if complete < len(entries):
+            report_missing(entries[complete:], bytes(responses[RESPONSE_SIZE * complete:received]), prefix)
+            print(f"{prefix}{RED}Error: Cycle stopped after {complete} of {len(entries)} responses.{RESET}")
+            raise ResponseError(f"cycle stopped after {complete} of {len(entries)} responses")
+
+# Transport for an asyncio stream pair (a TCP connection or a serial port
+# opened with serial.aio) with the awaitable interface run_ops uses.
+# recv_exact raises socket.timeout if nothing arrives, as TcpTransport does,
+# and returns the partial bytes if the device closes the connection.
+class StreamTransport:
+    def __init__(self, reader, writer, timeout=5):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def recv_exact(self, size):
+        try:
+            return await asyncio.wait_for(self.reader.readexactly(size), self.timeout)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+        except asyncio.TimeoutError:
+            raise socket.timeout("timed out") from None
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def close(self):
+        self.writer.close()
+
+# Function to run commands against one device of a fleet; returns True on success
+async def run_device_async(target, program, window=DEFAULT_WINDOW, pacing=DEFAULT_PACING):
+    connection_type, address, port = target
+    prefix = f"[{address}:{port}] " if port else f"[{address}] "
+    try:
+        if connection_type == "network":
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), 5)
+        elif os.name == 'nt':
+            return await run_serial_in_thread(target, program, window, pacing, prefix)
+        else:
+            # Opening blocks (socket:// connects, rfc2217:// negotiates), so it
+            # is done on a worker thread; ports with a file descriptor then
+            # share the event loop
+            ser = await asyncio.get_running_loop().run_in_executor(None, lambda: serial.serial_for_url(address, 9600, timeout=1))
+            try:
+                reader, writer = await serial.aio.open_serial_streams(ser)
+            except ValueError:
+                return await run_serial_in_thread(target, program, window, pacing, prefix, ser)
+    except (serial.SerialException, ValueError) as e:
+        print_with_timestamp(f"{prefix}{RED}Error: Could not open {address}. Details: {e}{RESET}")
+        return False
+    except (OSError, asyncio.TimeoutError) as e:
+        print_with_timestamp(f"{prefix}{RED}Error: Could not connect. Details: {e or 'timed out'}{RESET}")
+        return False
+    transport = StreamTransport(reader, writer)
+    try:
+        await run_ops(program.ops, transport, window, pacing, prefix)
+        return True
+    except socket.timeout:
+        print_with_timestamp(f"{prefix}{RED}Error: Server response timed out.{RESET}")
+        return False
+    except ResponseError:
+        print_with_timestamp(f"{prefix}{RED}Error: Responses no longer match the requests. Stopped.{RESET}")
+        return False
+    except OSError as e:
+        print_with_timestamp(f"{prefix}{RED}Error: Connection lost. Details: {e}{RESET}")
+        return False
+    finally:
+        transport.close()
+
+# Function to run a serial target the event loop can not wait on (Windows
+# ports, serial URLs without a file descriptor) with the normal engine on a
+# worker thread; ser is the port if it is already open
+async def run_serial_in_thread(target, program, window, pacing, prefix, ser=None):
+    connection_type, address, _ = target
+    def run_serial():
+        if ser is not None:
+            transport = SerialTransport(ser, address)
+        elif connection_type == "url":
+            transport = SerialTransport.open_url(address)
+        else:
+            transport = SerialTransport.open_port(address)
+        try:
+            run_pipelined(program.ops, transport, window, pacing, prefix)
+        finally:
+            transport.close()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, run_serial)
+        return True
+    except (serial.SerialException, ValueError) as e:
+        print_with_timestamp(f"{prefix}{RED}Error: Could not open {address}. Details: {e}{RESET}")
+        return False
+    except ResponseError:
+        print_with_timestamp(f"{prefix}{RED}Error: Responses no longer match the requests. Stopped.{RESET}")
+        return False
+
+# Function to run the same commands against many devices concurrently
+async def run_fleet(targets, program, window=DEFAULT_WINDOW, pacing=DEFAULT_PACING):
+    start = time.monotonic()
+    results = await asyncio.gather(*(run_device_async(target, program, window, pacing) for target in targets))
+    print_with_timestamp(f"Fleet run complete: {sum(results)} of {len(targets)} devices succeeded in {time.monotonic() - start:.2f}s")
+    return all(results)
+
 # Function to check for key press
 def check_key_press():
     if os.name == 'nt':
@@ -249,25 +1062,155 @@ def check_key_press_linux():
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
     return False
 
-# Main function to handle the client-server communication
-def main():
-    product, connection_type, address, port = get_user_input()
+# Function to measure throughput and round-trip latency against a transport.
+# Frames are built before timing starts; the latency of a transaction is the
+# time from sending its batch to receiving the batch's last response.
+def run_benchmark(transport, options):
+    window = max(options.window, options.batch)
+    batches, sizes, checks = [], [], []
+    for first in range(0, options.count, options.batch):
+        frames, batch_checks = [], []
+        for index in range(first, min(first + options.batch, options.count)):
+            register = (options.address + index % BENCH_SPAN) & 0x7FFF
+            if int((index + 1) * options.writes) > int(index * options.writes):
+                value = index & 0xFFFF
+                frames.append(struct.pack('<HHHH', register, value, register | 0x8000, 0))
+                batch_checks.append((index - first, value))
+            else:
+                frames.append(struct.pack('<HH', register | 0x8000, 0))
+        batches.append(b''.join(frames))
+        sizes.append(len(frames))
+        checks.append(batch_checks)
 
-    if connection_type == "network":
-        # Create a TCP socket
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    latencies = []
+    errors = {'timeout': 0, 'partial': 0, 'reset': 0, 'mismatch': 0}
+    failure = None
+    responses = bytearray(RESPONSE_SIZE * options.batch)
+    view = memoryview(responses)
+    in_flight = deque()
+    outstanding = 0
+    next_batch = 0
+    start = time.perf_counter()
+    while next_batch < len(batches) or in_flight:
+        try:
+            while next_batch < len(batches) and outstanding + sizes[next_batch] <= window:
+                transport.send(batches[next_batch])
+                in_flight.append((time.perf_counter(), next_batch))
+                outstanding += sizes[next_batch]
+                next_batch += 1
+        except OSError:
+            failure = 'reset'
+            break
+        sent_at, batch = in_flight.popleft()
+        size = sizes[batch]
+        outstanding -= size
+        try:
+            received = transport.recv_exact_into(view[:RESPONSE_SIZE * size])
+        except socket.timeout:
+            received = 0
+            failure = 'timeout'
+        except OSError:
+            received = 0
+            failure = 'reset'
+        done = time.perf_counter()
+        if received < RESPONSE_SIZE * size:
+            # The response stream can not be trusted after a lost frame, so
+            # stop; the transactions after it are counted as not run
+            latencies.extend([done - sent_at] * (received // RESPONSE_SIZE))
+            failure = failure or ('partial' if received % RESPONSE_SIZE else 'reset' if transport.eof else 'timeout')
+            break
+        latencies.extend([done - sent_at] * size)
+        for index, value in checks[batch]:
+            if struct.unpack_from('<H', responses, RESPONSE_SIZE * index + 2)[0] != value:
+                errors['mismatch'] += 1
+    elapsed = time.perf_counter() - start
+    if failure:
+        errors[failure] += 1
+
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else None
+    return {
+        'target': getattr(transport, 'name', ''),
+        'transactions': len(latencies),
+        'requested': options.count,
+        'window': window,
+        'batch': options.batch,
+        'writes': options.writes,
+        'elapsed_s': elapsed,
+        'transactions_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99), 'max': latencies[-1] * 1000 if latencies else None},
+        'errors': errors,
+        'not_run': options.count - len(latencies) - (1 if failure else 0),
+    }
+
+# Function to print (and log) a benchmark result
+def report_benchmark(result):
+    latency = result['latency_ms']
+    errors = result['errors']
+    print_with_timestamp(f"Benchmark {result['target']}: {result['transactions']} of {result['requested']} transactions in {result['elapsed_s']:.3f}s "
+                         f"({result['transactions_per_s']:.0f}/s, window {result['window']}, batch {result['batch']}, writes {result['writes']:g})")
+    if latency['max'] is not None:
+        print_with_timestamp(f"Benchmark latency ms: p50 {latency['p50']:.3f}, p95 {latency['p95']:.3f}, p99 {latency['p99']:.3f}, max {latency['max']:.3f}")
+    colour = RED if any(errors.values()) else ""
+    print_with_timestamp(f"{colour}Benchmark errors: {errors['timeout']} timeouts, {errors['partial']} partial, {errors['reset']} resets, {errors['mismatch']} mismatches, "
+                         f"{result['not_run']} not run{RESET if colour else ''}")
+
+# Function to run the interactive command session over any transport
+def run_session(product, transport, window=DEFAULT_WINDOW, pacing=DEFAULT_PACING, keyframe=None):
+    while True:
+        valid, program = get_user_commands(product)
+        if not valid:
+            continue
+        print("-" * 50)  # Horizontal line before command results
+        if isinstance(program, BenchOptions):
+            report_benchmark(run_benchmark(transport, program))
+            print("-" * 50)  # Horizontal line after all command results
+            continue
+        if program.continuous:
+            print("Continuous send enabled. Press 'Q' to cancel.")
+        # Continuous mode replays the program from one preassembled buffer
+        plan = ContinuousPlan(program.ops, window) if program.continuous and program.ops and not pacing else None
+        # Delta logging only reports reads that changed since the last cycle
+        delta = DeltaReporter(keyframe) if program.continuous and keyframe else None
+        report = delta.report if delta else report_data_word
+        while True:
+            try:
+                if plan:
+                    plan.run(transport, report=report)
+                else:
+                    run_pipelined(program.ops, transport, window, pacing, report=report)
+            except socket.timeout:
+                print(f"{RED}Error: Server response timed out.{RESET}")
+                return
+            except ResponseError:
+                print(f"{RED}Error: Responses no longer match the requests. Session stopped.{RESET}")
+                return
+            if not program.continuous:
+                break
+            if delta:
+                delta.check_keyframe()
+            if not program.ops:
+                time.sleep(0.1)
+            if check_key_press():
+                print("Continuous send stopped.")
+                if delta:
+                    delta.summary()
+                break
+        print("-" * 50)  # Horizontal line after all command results
 
-        # Connect to the server
+# Function to open the transport for the selected connection type
+def open_transport(connection_type, address, port):
+    if connection_type == "network":
+        # Connect to the server over TCP
         try:
-            client_socket.settimeout(5)  # Set a timeout of 5 seconds
-            client_socket.connect((address, port))
+            transport = TcpTransport(address, port, timeout=5)  # Set a timeout of 5 seconds
             print(f"Connected to server at {address}:{port}")
+            return transport
         except socket.timeout:
             print(f"{RED}Error: Connection to {address} timed out.{RESET}")
-            return
         except socket.gaierror:
             print(f"{RED}Error: The IP address {address} cannot be found.{RESET}")
-            return
         except socket.error as e:
             if e.errno == 111:  # Connection refused
                 print(f"{RED}Error: Connection refused by {address}.{RESET}")
@@ -275,145 +1218,130 @@ def main():
                 print(f"{RED}Error: No route to host {address}.{RESET}")
             else:
                 print(f"{RED}Error: The IP address {address} is in use or cannot be connected to. Details: {e}{RESET}")
-            return
-
-        while True:
-            valid, commands, continuous_flag = get_user_commands()
-            if not valid:
-                continue
-            print("-" * 50)  # Horizontal line before command results
-            if continuous_flag:
-                print("Continuous send enabled. Press 'Q' to cancel.")
-            while continuous_flag:
-                if not commands:
-                    if check_key_press():
-                        print("Continuous send stopped.")
-                        continuous_flag = False
-                        break
-                    time.sleep(0.1)
-                    continue
-                for command in commands:
-                    if command[0] == 'delay':
-                        time.sleep(command[1])
-                        continue
-                    rw, address, val = command
-                    if rw == 'w' and address and val:
-                        print_with_timestamp(f"Write Complete. Address: {address}, Value: {val}", rw, address, val)
-                        packet = create_data_packet(product, rw, address, val)
-                        try:
-                            client_socket.sendall(packet)
-                            # Read back to verify
-                            packet = create_data_packet(product, 'r', address)
-                            client_socket.sendall(packet)
-                            time.sleep(0.1)  # Small delay before reading the response
-                            response = client_socket.recv(4)
-                            if len(response) >= 4:
-                                data_word = struct.unpack('<H', response[2:4])[0]  # Extract 4th byte followed by 3rd byte
-                                if data_word == int(val, 16):
-                                    print_with_timestamp(f"Write Verified. Address: {address} Data: 0x{data_word:04X} ({data_word})", 'r', address, val)
-                                else:
-                                    print_with_timestamp(f"{RED}Write Error: Different Value Read Back. Address: {address} Data: 0x{data_word:04X} ({data_word}){RESET}", 'r', address, val)
-                            else:
-                                print(f"{RED}Unknown error: {response}{RESET}")
-                        except socket.timeout:
-                            print(f"{RED}Error: Server response timed out.{RESET}")
-                            return
-                    elif rw == 'r' and address:
-                        packet = create_data_packet(product, rw, address)
-                        try:
-                            client_socket.sendall(packet)
-                            time.sleep(0.1)  # Small delay before reading the response
-                            response = client_socket.recv(4)
-                            if len(response) >= 4:
-                                data_word = struct.unpack('<H', response[2:4])[0]  # Extract 4th byte followed by 3rd byte
-                                print_with_timestamp(f"Read Complete. Address: {address} Data: 0x{data_word:04X} ({data_word})", rw, address)
-                            else:
-                                print(f"{RED}Unknown error: {response}{RESET}")
-                        except socket.timeout:
-                            print(f"{RED}Error: Server response timed out.{RESET}")
-                            return
-                    else:
-                        print(f"{RED}Please enter a valid command{RESET}")
-                    time.sleep(0.5)  # Delay of 0.5 seconds between commands
-                    if continuous_flag and check_key_press():
-                        print("Continuous send stopped.")
-                        continuous_flag = False
-                        break
-                if not continuous_flag:
-                    break
-            print("-" * 50)  # Horizontal line after all command results
-    elif os.name == 'nt':
-        # Create a serial connection
+        return None
+    if connection_type == "url":
+        # Open a serial URL (loop://, socket://, rfc2217://, ...)
         try:
-            ser = serial.Serial(address, 9600, timeout=1)
-            # Test the connection by writing and reading a test message
-            test_message = b'\x00'
-            ser.write(test_message)
-            response = ser.read(1)
-            if response != test_message:
-                print(f"{RED}Error: No Server listening on {address.upper()}.{RESET}")
-                return
-            print(f"Connected to {address.upper()}")
-        except serial.SerialException as e:
-            print(f"{RED}Error: Could not open COM port {address}. Details: {e}{RESET}")
-            return
+            transport = SerialTransport.open_url(address)
+            print(f"Connected to {address}")
+            return transport
+        except (serial.SerialException, ValueError) as e:
+            print(f"{RED}Error: Could not open {address}. Details: {e}{RESET}")
+        return None
+    # Create a serial connection
+    try:
+        transport = SerialTransport.open_port(address)
+    except serial.SerialException as e:
+        print(f"{RED}Error: Could not open COM port {address}. Details: {e}{RESET}")
+        return None
+    # Test the connection by writing and reading a test message
+    test_message = b'\x00'
+    if transport.transact(test_message, 1) != test_message:
+        print(f"{RED}Error: No Server listening on {address.upper()}.{RESET}")
+        transport.close()
+        return None
+    print(f"Connected to {address.upper()}")
+    return transport
 
-        while True:
-            valid, commands, continuous_flag = get_user_commands()
-            if not valid:
-                continue
-            print("-" * 50)  # Horizontal line before command results
-            if continuous_flag:
-                print("Continuous send enabled. Press 'Q' to cancel.")
-            while continuous_flag:
-                if not commands:
-                    if check_key_press():
-                        print("Continuous send stopped.")
-                        continuous_flag = False
-                        break
-                    time.sleep(0.1)
-                    continue
-                for command in commands:
-                    if command[0] == 'delay':
-                        time.sleep(command[1])
-                        continue
-                    rw, address, val = command
-                    if rw == 'w' and address and val:
-                        packet = create_data_packet(product, rw, address, val)
-                        ser.write(packet)
-                        print_with_timestamp(f"Write Complete. Address: {address}, Value: {val}", rw, address, val)
-                        # Read back to verify
-                        packet = create_data_packet(product, 'r', address)
-                        ser.write(packet)
-                        time.sleep(0.1)  # Small delay before reading the response
-                        response = ser.read(4)
-                        if len(response) >= 4:
-                            data_word = struct.unpack('<H', response[2:4])[0]  # Extract 4th byte followed by 3rd byte
-                            if data_word == int(val, 16):
-                                print_with_timestamp(f"Write Verified. Address: {address} Data: 0x{data_word:04X} ({data_word})", 'r', address, val)
-                            else:
-                                print_with_timestamp(f"{RED}Write Error: Different Value Read Back. Address: {address} Data: 0x{data_word:04X} ({data_word}){RESET}", 'r', address, val)
-                        else:
-                            print(f"{RED}Unknown error: {response}{RESET}")
-                    elif rw == 'r' and address:
-                        packet = create_data_packet(product, rw, address)
-                        ser.write(packet)
-                        response = ser.read(4)
-                        if len(response) >= 4:
-                            data_word = struct.unpack('<H', response[2:4])[0]  # Extract 4th byte followed by 3rd byte
-                            print_with_timestamp(f"Read Complete. Address: {address} Data: 0x{data_word:04X} ({data_word})", rw, address)
-                        else:
-                            print(f"{RED}Unknown error: {response}{RESET}")
-                    else:
-                        print(f"{RED}Please enter a valid command{RESET}")
-                    time.sleep(0.5)  # Delay of 0.5 seconds between commands
-                    if continuous_flag and check_key_press():
-                        print("Continuous send stopped.")
-                        continuous_flag = False
-                        break
-                if not continuous_flag:
-                    break
-            print("-" * 50)  # Horizontal line after all command results
+# Function to run one command script against many devices and exit
+def run_fleet_mode(args):
+    config = read_config()
+    window, pacing = get_pipeline_settings(config)
+    product = (args.product or config.get('product') or "TOC").upper()
+    targets = []
+    for text in args.targets:
+        target = parse_target(text)
+        if target is None:
+            print(f"{RED}Invalid target: {text}. Use IP:PORT, a COM port, a /dev/ path or a serial URL.{RESET}")
+            return False
+        targets.append(target)
+    # Capture records have no target field, so samples from several devices could not be told apart
+    if len(targets) > 1 and is_enabled(config, 'capture'):
+        print(f"{YELLOW}Warning: 'capture' is ignored when running against multiple targets.{RESET}")
+    else:
+        start_capture(config)
+    valid, program = load_program(product, args.commands, get_aliases(config))
+    if not valid:
+        return False
+    if program.continuous:
+        print(f"{YELLOW}Warning: 'cont' is ignored when running against multiple targets.{RESET}")
+    return asyncio.run(run_fleet(targets, program, window, pacing))
+
+# Function to start the register simulator from server.py on a free local
+# port in a background thread; returns the port
+def start_local_simulator():
+    import server
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    threading.Thread(target=server.handle_network_communication, args=('127.0.0.1', port, 1, False), daemon=True).start()
+    time.sleep(0.2)  # Give the simulator time to start listening
+    return port
+
+# Function to run one benchmark from the command line and exit
+def run_bench_mode(args):
+    tokens = [str(args.count), f"batch={args.batch}", f"writes={args.writes}"]
+    valid, options = parse_bench_options(tokens, args.window)
+    if not valid:
+        return False
+    if args.bench.lower() == 'local':
+        target = ("network", '127.0.0.1', start_local_simulator())
+    else:
+        target = parse_target(args.bench)
+        if target is None:
+            print(f"{RED}Invalid target: {args.bench}. Use IP:PORT, a COM port, a /dev/ path, a serial URL or 'local'.{RESET}")
+            return False
+    transport = open_transport(*target)
+    if transport is None:
+        return False
+    try:
+        result = run_benchmark(transport, options)
+    finally:
+        transport.close()
+    report_benchmark(result)
+    if args.json == '-':
+        print(json.dumps(result, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+    return not any(result['errors'].values())
+
+# Main function to handle the client-server communication
+def main():
+    parser = argparse.ArgumentParser(description="Simple Local Control")
+    parser.add_argument('--targets', nargs='+', metavar='TARGET', help="run --commands against many devices concurrently (IP:PORT, COM port, /dev/ path or serial URL)")
+    parser.add_argument('--commands', default="", help="';' separated commands, alias or command file to run with --targets")
+    parser.add_argument('--product', help="product type (TOC or ROC) for --targets")
+    parser.add_argument('--bench', metavar='TARGET', help="benchmark a target (IP:PORT, COM port, /dev/ path, serial URL or 'local' for the simulator) and exit")
+    parser.add_argument('--count', type=int, default=10000, help="transactions for --bench (default 10000)")
+    parser.add_argument('--window', type=int, help="responses in flight for --bench (default from config.ini)")
+    parser.add_argument('--batch', type=int, default=1, help="frames sent together for --bench (default 1)")
+    parser.add_argument('--writes', type=float, default=0.0, help="fraction of --bench transactions that are verified writes (default 0)")
+    parser.add_argument('--json', metavar='PATH', help="also write the --bench result as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args()
+    if args.bench:
+        if not run_bench_mode(args):
+            sys.exit(1)
+        return
+    if args.targets:
+        if not run_fleet_mode(args):
+            sys.exit(1)
+        return
+
+    product, connection_type, address, port = get_user_input()
+    config = read_config()
+    window, pacing = get_pipeline_settings(config)
+    keyframe = get_delta_settings(config)
+    start_capture(config)
+
+    transport = open_transport(connection_type, address, port)
+    if transport is None:
+        return
+    try:
+        run_session(product, transport, window, pacing, keyframe)
+    finally:
+        transport.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
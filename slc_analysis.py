@@ -0,0 +1,177 @@
+import argparse
+import csv
+import functools
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from slc_capture import open_capture, ADELAIDE_TZ, RW_WRITE, RW_READ, RW_VERIFY, STATUS_OK, STATUS_MISMATCH
+
+# NumPy layout of one capture slot (see slc_capture for the file format)
+RECORD_DTYPE = np.dtype([('timestamp', '<i8'), ('rw', 'u1'), ('status', 'u1'),
+                         ('address', '<u2'), ('value', '<u2'), ('expected', '<u2')])
+
+# Per-address statistics returned by Session.address_stats (target indexes
+# Session.targets)
+STATS_DTYPE = np.dtype([('target', '<u2'), ('address', '<u2'), ('count', '<i8'), ('min', '<u2'), ('max', '<u2'),
+                        ('mean', '<f8'), ('changes', '<i8')])
+
+# Pattern for the data word in a CSV log message
+DATA_PATTERN = re.compile(r'Data: 0x([0-9A-Fa-f]{1,4})')
+
+# Pattern for the device prefix fleet mode puts in front of a log message
+TARGET_PATTERN = re.compile(r'\[([^\]]+)\] ')
+
+# Class holding one session's samples as NumPy columns. Columns of a capture
+# file are zero-copy views of the memory-mapped file, so they also contain
+# the index slots (rw == RW_INDEX); the statistics skip them. target holds
+# each record's index into targets, the device names of a fleet session log
+# ('' for a single device).
+class Session:
+    def __init__(self, records, wall_offset_ns=0, target=None, targets=('',)):
+        self.records = records
+        self.wall_offset_ns = wall_offset_ns  # Add to timestamp for wall-clock ns
+        self.target = np.zeros(len(records), dtype=np.uint16) if target is None else target
+        self.targets = targets
+        self.timestamp = records['timestamp']
+        self.rw = records['rw']
+        self.status = records['status']
+        self.address = records['address']
+        self.value = records['value']
+        self.expected = records['expected']
+
+    # Function to open a binary capture file without copying it
+    @classmethod
+    def from_capture(cls, path):
+        header, records = open_capture(path)
+        return cls(np.frombuffer(records, dtype=RECORD_DTYPE), header.start_wall_ns - header.start_monotonic_ns)
+
+    # Function to load a CSV session log (parsed once into the same columns)
+    @classmethod
+    def from_csv(cls, path):
+        rows, target, names = [], [], {}
+        with open(path, newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)  # Header
+            for row in reader:
+                parsed = parse_csv_row(row)
+                if parsed is not None:
+                    name, record = parsed
+                    target.append(names.setdefault(name, len(names)))
+                    rows.append(record)
+        return cls(np.array(rows, dtype=RECORD_DTYPE), 0, np.array(target, dtype=np.uint16), tuple(names) or ('',))
+
+    # Function to open a capture file or CSV session log by extension
+    @classmethod
+    def open(cls, path):
+        if path.lower().endswith('.csv'):
+            return cls.from_csv(path)
+        return cls.from_capture(path)
+
+    def __len__(self):
+        return len(self.records)
+
+    # Function to slice the session to [start, end) seconds from its first
+    # record; timestamps are in order, so this is a view, not a copy
+    def window(self, start=None, end=None):
+        if not len(self.records):
+            return self
+        first = self.timestamp[0]
+        lo = 0 if start is None else np.searchsorted(self.timestamp, first + int(start * 1e9), 'left')
+        hi = len(self.records) if end is None else np.searchsorted(self.timestamp, first + int(end * 1e9), 'left')
+        return Session(self.records[lo:hi], self.wall_offset_ns, self.target[lo:hi], self.targets)
+
+    # Function to get a mask of good reads (plain reads and write read-backs)
+    def read_mask(self):
+        return ((self.rw == RW_READ) | (self.rw == RW_VERIFY)) & ((self.status == STATUS_OK) | (self.status == STATUS_MISMATCH))
+
+    # Function to compute count, min, max, mean and number of value changes
+    # for every target and address that was read, in one pass of vectorised
+    # operations
+    def address_stats(self):
+        mask = self.read_mask()
+        keys = (self.target[mask].astype(np.int64) << 16) | self.address[mask]
+        values = self.value[mask]
+        if not len(keys):
+            return np.zeros(0, dtype=STATS_DTYPE)
+        # A stable sort groups samples by target and address while keeping time order
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        values = values[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        changed = np.zeros(len(values), dtype=np.int64)
+        changed[1:] = (values[1:] != values[:-1]) & (keys[1:] == keys[:-1])
+        stats = np.zeros(len(starts), dtype=STATS_DTYPE)
+        stats['target'] = keys[starts] >> 16
+        stats['address'] = keys[starts] & 0xFFFF
+        stats['count'] = np.diff(np.r_[starts, len(keys)])
+        stats['min'] = np.minimum.reduceat(values, starts)
+        stats['max'] = np.maximum.reduceat(values, starts)
+        stats['mean'] = np.add.reduceat(values.astype(np.int64), starts) / stats['count']
+        stats['changes'] = np.add.reduceat(changed, starts)
+        return stats
+
+# Function to turn one CSV log row into (target, record tuple), where target
+# is the device name of a fleet log message or '' (None for rows such as
+# comments, keyframes and summaries that are not samples)
+def parse_csv_row(row):
+    if len(row) < 5 or not row[3]:
+        return None
+    timestamp, message, rw, address, value = row[:5]
+    target = ''
+    match = TARGET_PATTERN.match(message)
+    if match:
+        target = match.group(1)
+        message = message[match.end():]
+    record = parse_csv_message(timestamp, message, address, value)
+    return None if record is None else (target, record)
+
+# Function to turn the fields of one CSV log row into a record tuple, or None
+def parse_csv_message(timestamp, message, address, value):
+    if 'Keyframe.' in message or ('Error:' in message and 'Write Error' not in message):
+        return None
+    stamp = parse_timestamp(timestamp)
+    register = int(address, 16) & 0x7FFF
+    if 'Write Complete' in message:
+        written = int(value, 16)
+        return stamp, RW_WRITE, STATUS_OK, register, written, 0
+    match = DATA_PATTERN.search(message)
+    if match is None:
+        return None
+    data_word = int(match.group(1), 16)
+    if 'Write Verified' in message:
+        return stamp, RW_VERIFY, STATUS_OK, register, data_word, int(value, 16)
+    if 'Write Error' in message:
+        return stamp, RW_VERIFY, STATUS_MISMATCH, register, data_word, int(value, 16)
+    return stamp, RW_READ, STATUS_OK, register, data_word, 0
+
+# Function to convert a log timestamp to epoch nanoseconds. Log timestamps
+# have one-second resolution, so each distinct one is converted only once.
+@functools.lru_cache(maxsize=4096)
+def parse_timestamp(timestamp):
+    return int(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=ADELAIDE_TZ).timestamp()) * 1_000_000_000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-address statistics for an SLC capture file or CSV session log")
+    parser.add_argument('path', help="capture file (.slc) or CSV session log")
+    parser.add_argument('--start', type=float, help="start of the time window in seconds from the first record")
+    parser.add_argument('--end', type=float, help="end of the time window in seconds from the first record")
+    args = parser.parse_args()
+    try:
+        session = Session.open(args.path).window(args.start, args.end)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not open {args.path}. Details: {e}")
+        sys.exit(1)
+    stats = session.address_stats()
+    if len(session.targets) > 1:
+        # Fleet session log: one row per target and address
+        width = max(len('Target'), *(len(name) for name in session.targets))
+        print(f"{'Target':<{width}} {'Address':>7} {'Count':>10} {'Min':>6} {'Max':>6} {'Mean':>10} {'Changes':>9}")
+        for row in stats:
+            print(f"{session.targets[row['target']]:<{width}}    {row['address']:04X} {row['count']:>10} {row['min']:>6} {row['max']:>6} {row['mean']:>10.2f} {row['changes']:>9}")
+    else:
+        print(f"{'Address':>7} {'Count':>10} {'Min':>6} {'Max':>6} {'Mean':>10} {'Changes':>9}")
+        for row in stats:
+            print(f"   {row['address']:04X} {row['count']:>10} {row['min']:>6} {row['max']:>6} {row['mean']:>10.2f} {row['changes']:>9}")
@@ -0,0 +1,160 @@
+import struct
+import threading
+import atexit
+import time
+import mmap
+import csv
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+# Binary capture file layout (all little-endian):
+#   header  - 64 bytes: magic, version, record size, index interval,
+#             wall-clock and monotonic start times in nanoseconds
+#   records - fixed 16-byte slots: monotonic ns timestamp, rw, status,
+#             address, value, expected (the value written, for verify reads)
+# An index slot (rw = RW_INDEX) holding the number of data records written so
+# far starts the file and follows every 'index interval' data records, so
+# index slot n is always at slot n * (index interval + 1).
+MAGIC = b'SLCCAP01'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIqq32x')
+RECORD = struct.Struct('<qBBHHH')
+INDEX = struct.Struct('<qBBHI')
+INDEX_INTERVAL = 4096
+
+# Record rw codes
+RW_WRITE = 0
+RW_READ = 1
+RW_VERIFY = 2  # Read back after a write
+RW_INDEX = 0xFF
+
+# Record status codes
+STATUS_OK = 0
+STATUS_MISMATCH = 1  # Verify read back a different value
+STATUS_PARTIAL = 2
+STATUS_NO_RESPONSE = 3
+
+# Adelaide time, as used for the CSV session log
+ADELAIDE_TZ = timezone(timedelta(hours=10.5))
+CSV_HEADER = ["Timestamp", "Message", "RW", "Address", "Value"]
+
+CaptureHeader = namedtuple('CaptureHeader', ['version', 'record_size', 'index_interval', 'start_wall_ns', 'start_monotonic_ns'])
+
+# Class to append fixed-width records to a capture file
+class CaptureWriter:
+    def __init__(self, path, index_interval=INDEX_INTERVAL):
+        self.path = path
+        self.index_interval = index_interval
+        self._lock = threading.Lock()
+        self._count = 0
+        self._since_index = 0
+        self._closed = False
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, index_interval, time.time_ns(), time.monotonic_ns()))
+        self._write_index(time.monotonic_ns())
+        atexit.register(self.close)
+
+    # Append one record (address is the 15-bit register address)
+    def record(self, rw, address, value, status=STATUS_OK, expected=0):
+        timestamp = time.monotonic_ns()
+        with self._lock:
+            if self._closed:
+                return
+            if self._since_index == self.index_interval:
+                self._write_index(timestamp)
+            self._file.write(RECORD.pack(timestamp, rw, status, address, value, expected))
+            self._count += 1
+            self._since_index += 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.close()
+
+    # Index slots are written at fixed positions and flush the file, so at most
+    # one index interval of records is lost if SLC is killed
+    def _write_index(self, timestamp):
+        self._file.write(INDEX.pack(timestamp, RW_INDEX, 0, 0, self._count & 0xFFFFFFFF))
+        self._file.flush()
+        self._since_index = 0
+
+# Function to read and check the header of an open capture file
+def read_header(file):
+    data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("Not an SLC capture file: header is truncated")
+    magic, version, record_size, index_interval, start_wall_ns, start_monotonic_ns = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("Not an SLC capture file: bad magic")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"Unsupported SLC capture version {version} (record size {record_size})")
+    return CaptureHeader(version, record_size, index_interval, start_wall_ns, start_monotonic_ns)
+
+# Function to memory-map a capture file; returns (header, records) where
+# records is a read-only memoryview of every whole slot (index slots included)
+def open_capture(path):
+    with open(path, 'rb') as file:
+        header = read_header(file)
+        size = file.seek(0, 2)
+        if size <= HEADER.size:
+            return header, memoryview(b'')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    end = HEADER.size + (size - HEADER.size) // RECORD.size * RECORD.size  # Ignore a partly written last slot
+    return header, memoryview(mapped)[HEADER.size:end]
+
+# Function to iterate over the data records of a capture file as
+# (timestamp_ns, rw, status, address, value, expected) tuples
+def iter_records(path):
+    _, records = open_capture(path)
+    for record in RECORD.iter_unpack(records):
+        if record[1] != RW_INDEX:
+            yield record
+
+# Function to convert a capture file to the CSV session log layout
+def convert_to_csv(path, csv_path):
+    header, _ = open_capture(path)
+    offset_ns = header.start_wall_ns - header.start_monotonic_ns
+    last_second = None
+    count = 0
+    with open(csv_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for timestamp, rw, status, address, value, expected in iter_records(path):
+            second = (timestamp + offset_ns) // 1_000_000_000
+            if second != last_second:
+                last_second = second
+                stamp = datetime.fromtimestamp(second, ADELAIDE_TZ).strftime('%Y-%m-%d %H:%M:%S')
+            writer.writerow(format_csv_row(stamp, rw, status, address, value, expected))
+            count += 1
+    return count
+
+# Function to build the CSV row SLC would have logged for a record
+def format_csv_row(stamp, rw, status, address, value, expected):
+    address = f"{address:04X}"
+    if status == STATUS_NO_RESPONSE:
+        return [stamp, f"Error: No response. Address: {address}", 'r', address, ""]
+    if status == STATUS_PARTIAL:
+        return [stamp, f"Error: Partial response. Address: {address}", 'r', address, ""]
+    if rw == RW_WRITE:
+        return [stamp, f"Write Complete. Address: {address}, Value: {value:04X}", 'w', address, f"{value:04X}"]
+    if rw == RW_VERIFY:
+        if status == STATUS_MISMATCH:
+            return [stamp, f"Write Error: Different Value Read Back. Address: {address} Data: 0x{value:04X} ({value})", 'r', address, f"{expected:04X}"]
+        return [stamp, f"Write Verified. Address: {address} Data: 0x{value:04X} ({value})", 'r', address, f"{expected:04X}"]
+    return [stamp, f"Read Complete. Address: {address} Data: 0x{value:04X} ({value})", 'r', address, ""]
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python slc_capture.py <capture file> [<csv file>]")
+        sys.exit(1)
+    capture_path = sys.argv[1]
+    csv_path = sys.argv[2] if len(sys.argv) == 3 else capture_path.rsplit('.', 1)[0] + ".csv"
+    try:
+        count = convert_to_csv(capture_path, csv_path)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not convert {capture_path}. Details: {e}")
+        sys.exit(1)
+    print(f"Wrote {count} records to {csv_path}")
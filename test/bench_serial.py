@@ -0,0 +1,417 @@
+import argparse
+import json
+import os
+import platform
+import pty
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Benchmark the vendored copy of pySerial, not an installed one
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import serial
+import serial.rfc2217
+import serial.threaded
+
+# Bytes moved per throughput run. The loop:// and rfc2217:// backends and
+# read_until get a fixed fraction of it so a full run stays short; the sizes
+# used are recorded with the results. read_until reads in blocks now, but
+# keeps its smaller size so results stay comparable with runs from before
+# that change, when it read a byte at a time.
+DEFAULT_BYTES = 1 << 20
+DEFAULT_ROUND_TRIPS = 2000
+DEFAULT_REPEAT = 3
+CHUNK_SIZE = 4096       # Also the loop:// queue size, so writes never block on it
+LINE_SIZE = 64
+SLOW_BACKENDS = {'loop': 8, 'rfc2217': 8}
+SLOW_BENCHMARKS = {'read_until': 8}
+BACKENDS = ['pty', 'loop', 'socket', 'rfc2217']
+BENCHMARKS = ['write', 'read', 'readinto', 'read_until', 'reader_thread', 'latency']
+TIMEOUT = 10
+
+# Payload covering every byte value, so IAC (0xFF) escaping is exercised on rfc2217://
+PAYLOAD = bytes(range(256)) * (CHUNK_SIZE // 256)
+# Lines of LINE_SIZE bytes ending in LF, with no LF before the end
+LINE = bytes(b for b in range(256) if b != 0x0A)[:LINE_SIZE - 1] + b'\n'
+
+
+# Class for the far end of a port under test. A background thread either
+# echoes what the port sends or counts it (sink mode).
+class Peer:
+    def __init__(self):
+        self.sink = False
+        self.received = 0
+        self.done = threading.Event()
+        self.target = 0
+        self.alive = True
+
+    # Function to start counting the next total bytes the port sends
+    def start_sink(self, total):
+        self.received = 0
+        self.target = total
+        self.done.clear()
+        self.sink = True
+
+    # Function to wait for the sink to reach its total, then go back to echo
+    def wait_sink(self):
+        if not self.done.wait(TIMEOUT):
+            raise RuntimeError(f"peer received {self.received} of {self.target} bytes")
+        self.sink = False
+
+    # Function to send data to the port from a background thread
+    def send_async(self, chunks):
+        thread = threading.Thread(target=lambda: [self.send(chunk) for chunk in chunks], daemon=True)
+        thread.start()
+        return thread
+
+    def handle(self, data):
+        if self.sink:
+            self.received += len(data)
+            if self.received >= self.target:
+                self.done.set()
+        else:
+            self.send(data)
+
+    def run(self):
+        while self.alive:
+            try:
+                data = self.recv()
+            except OSError:
+                break
+            if not data:
+                break
+            self.handle(data)
+
+
+# Peer on the master side of a pty pair; the port opens the slave
+class PtyPeer(Peer):
+    def __init__(self):
+        super().__init__()
+        self.master, self.slave = pty.openpty()
+        self.url = os.ttyname(self.slave)
+
+    def send(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.master, view):]
+
+    def recv(self):
+        return os.read(self.master, 65536)
+
+    def close(self):
+        self.alive = False
+        os.close(self.master)
+        os.close(self.slave)
+
+
+# Peer accepting the socket:// connection on a local port
+class SocketPeer(Peer):
+    scheme = 'socket'
+
+    def __init__(self):
+        super().__init__()
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.url = f"{self.scheme}://127.0.0.1:{self.listener.getsockname()[1]}"
+        self.connection = None
+        self._ready = threading.Event()
+
+    def accept(self):
+        self.connection, _ = self.listener.accept()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._ready.set()
+
+    def run(self):
+        self.accept()
+        super().run()
+
+    def send(self, data):
+        self._ready.wait(TIMEOUT)
+        self.connection.sendall(data)
+
+    def recv(self):
+        return self.connection.recv(65536)
+
+    def close(self):
+        self.alive = False
+        if self.connection is not None:
+            self.connection.close()
+        self.listener.close()
+
+
+# Peer acting as a local RFC 2217 server. The PortManager handles the Telnet
+# negotiation and escaping; a loop:// instance stands in for the serial port
+# whose settings the client changes, so no data passes through it.
+class Rfc2217Peer(SocketPeer):
+    scheme = 'rfc2217'
+
+    def __init__(self):
+        super().__init__()
+        self.manager = None
+        self._write_lock = threading.Lock()
+
+    def accept(self):
+        self.connection, _ = self.listener.accept()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.manager = serial.rfc2217.PortManager(serial.serial_for_url('loop://'), self)
+        self._ready.set()
+
+    # Connection interface used by the PortManager
+    def write(self, data):
+        with self._write_lock:
+            self.connection.sendall(data)
+
+    def send(self, data):
+        self._ready.wait(TIMEOUT)
+        self.write(self.manager.escape_data(data))
+
+    def recv(self):
+        while True:
+            data = self.connection.recv(65536)
+            if not data:
+                return data
+            data = self.manager.filter_data(data)
+            if data:
+                return data
+
+
+# The loop:// port is its own peer: what it writes it reads back, so echo
+# needs no thread and sink mode drains the port from a thread of its own
+class LoopPeer(Peer):
+    url = 'loop://'
+
+    def attach(self, port):
+        self.port = port
+
+    def start_sink(self, total):
+        super().start_sink(total)
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self):
+        while self.received < self.target:
+            self.handle(self.port.read(min(CHUNK_SIZE, self.target - self.received)))
+
+    def send(self, data):
+        self.port.write(data)
+
+    def run(self):
+        pass
+
+    def close(self):
+        pass
+
+
+PEERS = {'pty': PtyPeer, 'loop': LoopPeer, 'socket': SocketPeer, 'rfc2217': Rfc2217Peer}
+
+
+# Function to open a backend; returns (port, peer)
+def open_backend(name):
+    peer = PEERS[name]()
+    threading.Thread(target=peer.run, daemon=True).start()
+    port = serial.serial_for_url(peer.url, baudrate=115200, timeout=TIMEOUT)
+    if name == 'loop':
+        peer.attach(port)
+    return port, peer
+
+
+# Function to time a run; returns (elapsed seconds, CPU seconds). CPU time is
+# for the whole process, so it includes the peer thread.
+def timed(run):
+    cpu = time.process_time()
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start, time.process_time() - cpu
+
+
+def bench_write(port, peer, total):
+    chunks = [PAYLOAD] * (total // len(PAYLOAD))
+
+    def run():
+        peer.start_sink(total)
+        for chunk in chunks:
+            port.write(chunk)
+        peer.wait_sink()
+    return timed(run)
+
+
+def bench_read(port, peer, total):
+    def run():
+        sender = peer.send_async([PAYLOAD] * (total // len(PAYLOAD)))
+        remaining = total
+        while remaining:
+            data = port.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise RuntimeError(f"read timed out with {remaining} bytes to go")
+            remaining -= len(data)
+        sender.join()
+    return timed(run)
+
+
+def bench_readinto(port, peer, total):
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+
+    def run():
+        sender = peer.send_async([PAYLOAD] * (total // len(PAYLOAD)))
+        remaining = total
+        while remaining:
+            n = port.readinto(view[:min(CHUNK_SIZE, remaining)])
+            if not n:
+                raise RuntimeError(f"readinto timed out with {remaining} bytes to go")
+            remaining -= n
+        sender.join()
+    return timed(run)
+
+
+def bench_read_until(port, peer, total):
+    lines = total // len(LINE)
+
+    def run():
+        sender = peer.send_async([LINE * (CHUNK_SIZE // len(LINE))] * (lines * len(LINE) // CHUNK_SIZE))
+        for _ in range(lines):
+            if not port.read_until(b'\n').endswith(b'\n'):
+                raise RuntimeError("read_until timed out")
+        sender.join()
+    return timed(run)
+
+
+# Protocol counting bytes for the ReaderThread benchmark
+class CountingProtocol(serial.threaded.Protocol):
+    def __init__(self):
+        self.received = 0
+        self.target = 0
+        self.done = threading.Event()
+
+    def data_received(self, data):
+        self.received += len(data)
+        if self.received >= self.target:
+            self.done.set()
+
+
+def bench_reader_thread(port, peer, total):
+    reader = serial.threaded.ReaderThread(port, CountingProtocol)
+    reader.start()
+    _, protocol = reader.connect()
+    protocol.target = total
+
+    def run():
+        sender = peer.send_async([PAYLOAD] * (total // len(PAYLOAD)))
+        if not protocol.done.wait(TIMEOUT):
+            raise RuntimeError(f"ReaderThread received {protocol.received} of {total} bytes")
+        sender.join()
+    try:
+        return timed(run)
+    finally:
+        reader.stop()
+
+
+# Function to time single-byte round trips; returns sorted latencies in seconds
+def bench_latency(port, peer, round_trips):
+    latencies = []
+    for _ in range(round_trips):
+        start = time.perf_counter()
+        port.write(b'\x55')
+        if port.read(1) != b'\x55':
+            raise RuntimeError("round trip timed out")
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+# Function to run one benchmark on one backend, repeat times on a fresh port;
+# returns the median run (latencies are pooled over the repeats)
+def run_benchmark(backend, benchmark, total, round_trips, repeat):
+    results = []
+    for _ in range(repeat):
+        port, peer = open_backend(backend)
+        try:
+            port.reset_input_buffer()
+            if benchmark == 'latency':
+                results.extend(bench_latency(port, peer, round_trips))
+            else:
+                results.append(globals()['bench_' + benchmark](port, peer, total))
+        finally:
+            port.close()
+            peer.close()
+    if benchmark == 'latency':
+        results.sort()
+
+        def percentile(fraction):
+            return results[min(len(results) - 1, int(fraction * len(results)))] * 1e6
+        return {'round_trips': len(results), 'p50_us': percentile(0.50), 'p99_us': percentile(0.99),
+                'mean_us': sum(results) / len(results) * 1e6, 'max_us': results[-1] * 1e6}
+    elapsed, cpu = sorted(results)[len(results) // 2]
+    return {'bytes': total, 'bytes_per_s': total / elapsed, 'cpu_ms_per_mb': cpu * 1000 / (total / 1e6),
+            'elapsed_s': elapsed}
+
+
+# Function to describe the tree and machine the results came from
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'pyserial': serial.__version__}
+
+
+# Function to print a result line, with the change from a baseline run if given
+def report(backend, benchmark, result, baseline=None):
+    if benchmark == 'latency':
+        line = (f"{backend:<8} {benchmark:<14} p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us"
+                f"  max {result['max_us']:9.1f} us")
+        key, better = 'p50_us', min
+    else:
+        line = (f"{backend:<8} {benchmark:<14} {result['bytes_per_s'] / 1e6:9.2f} MB/s"
+                f"  {result['cpu_ms_per_mb']:9.1f} ms CPU/MB")
+        key, better = 'bytes_per_s', max
+    old = (baseline or {}).get(backend, {}).get(benchmark)
+    if old and old.get(key):
+        ratio = result[key] / old[key] if better is max else old[key] / result[key]
+        line += f"  ({ratio:.2f}x baseline)"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vendored pySerial backends over a pty pair, "
+                                                 "loop://, local socket:// and a local RFC 2217 server")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--bytes', type=int, default=DEFAULT_BYTES, help=f"bytes per throughput run (default {DEFAULT_BYTES})")
+    parser.add_argument('--round-trips', type=int, default=DEFAULT_ROUND_TRIPS,
+                        help=f"single-byte round trips per latency run (default {DEFAULT_ROUND_TRIPS})")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f"runs per benchmark (default {DEFAULT_REPEAT})")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON to PATH")
+    parser.add_argument('--compare', metavar='PATH', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+
+    results = {}
+    failed = False
+    for backend in args.backends:
+        for benchmark in args.benchmarks:
+            total = args.bytes // SLOW_BACKENDS.get(backend, 1) // SLOW_BENCHMARKS.get(benchmark, 1)
+            total -= total % CHUNK_SIZE
+            try:
+                result = run_benchmark(backend, benchmark, max(total, CHUNK_SIZE), args.round_trips, args.repeat)
+            except (RuntimeError, OSError, serial.SerialException) as e:
+                print(f"{backend:<8} {benchmark:<14} failed: {e}")
+                failed = True
+                continue
+            results.setdefault(backend, {})[benchmark] = result
+            report(backend, benchmark, result, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'environment': environment(), 'results': results}, file, indent=2)
+    sys.exit(1 if failed else 0)